@@ -0,0 +1,30 @@
+from hashlib import sha256
+
+from core import metrics
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+
+def token_cache_key(key: str) -> str:
+    """Ключ кеша для токена: сам токен в кеш не попадает."""
+    return "auth-token:" + sha256(key.encode()).hexdigest()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с кешированием пары токен -> пользователь.
+
+    Запись живет TOKEN_CACHE_TTL секунд и удаляется сигналами при удалении
+    токена или изменении пользователя. Удаление видят все процессы, которые
+    делят кеш default; если кеш не общий, токен после выхода остается
+    действительным в других процессах до TOKEN_CACHE_TTL секунд.
+    """
+
+    def authenticate_credentials(self, key: str) -> tuple:
+        cache_key = token_cache_key(key)
+        credentials = cache.get(cache_key)
+        metrics.cache_lookup("auth_token", credentials is not None)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache.set(cache_key, credentials, settings.TOKEN_CACHE_TTL)
+        return credentials
@@ -0,0 +1,130 @@
+"""Выполнение GET-запросов из пакета /api/batch/.
+
+Подзапросы не проходят middleware и повторную аутентификацию: DRF-вью
+получают пользователя пакета через принудительную аутентификацию, а
+асинхронные вью вызываются через async_to_sync. Все подзапросы выполняются
+в одном HTTP-запросе и делят с ним соединение с БД. Читать с реплики
+подзапрос может, если это разрешает его вью и клиент не закреплен за
+основной БД.
+"""
+import asyncio
+import logging
+
+import orjson
+from asgiref.sync import async_to_sync
+from core.routers import allow_replica_for, replica_reads
+from django.http import Http404, HttpRequest, HttpResponse, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.status import (
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+    HTTP_405_METHOD_NOT_ALLOWED,
+    HTTP_500_INTERNAL_SERVER_ERROR,
+)
+
+logger = logging.getLogger(__name__)
+# Пакет выполняет только адреса API, без админки и прочих страниц.
+API_NAMESPACE = "api"
+
+# Заголовки пакета, которые не относятся к подзапросам.
+SKIPPED_META = (
+    "CONTENT_LENGTH",
+    "CONTENT_TYPE",
+    "HTTP_IF_NONE_MATCH",
+    "HTTP_IF_MODIFIED_SINCE",
+)
+
+
+class SubRequest(HttpRequest):
+    """GET-запрос из пакета с заголовками и пользователем исходного."""
+
+    def __init__(self, parent: HttpRequest, path: str, query: str, user):
+        super().__init__()
+        self.method = "GET"
+        self.path = self.path_info = path
+        self.META = {
+            key: value
+            for key, value in parent.META.items()
+            if key not in SKIPPED_META
+        }
+        self.META.update(
+            REQUEST_METHOD="GET",
+            PATH_INFO=path,
+            QUERY_STRING=query,
+            HTTP_ACCEPT="application/json",
+        )
+        self.GET = QueryDict(query)
+        self.COOKIES = parent.COOKIES
+        self.user = user
+        self.pinned_to_primary = getattr(parent, "pinned_to_primary", False)
+        if user.is_authenticated:
+            self._force_auth_user = user
+        self._scheme = parent.scheme
+
+    def _get_scheme(self) -> str:
+        return self._scheme
+
+
+def _error(status: int, message: str) -> dict:
+    return {"status": status, "body": {"errors": message}}
+
+
+def _not_found() -> dict:
+    return {
+        "status": HTTP_404_NOT_FOUND,
+        "body": {"detail": NotFound.default_detail},
+    }
+
+
+def _body(response: HttpResponse) -> dict | list | str | None:
+    """Данные ответа подзапроса без повторного кодирования в JSON."""
+    if isinstance(response, Response):
+        return response.data
+    if hasattr(response, "render"):
+        response.render()
+    if not response.content:
+        return None
+    if response.get("Content-Type", "").startswith("application/json"):
+        return orjson.loads(response.content)
+    return response.content.decode(response.charset, "replace")
+
+
+def run_subrequest(request, item) -> dict:
+    """Выполняет один подзапрос пакета и возвращает его статус и данные."""
+    url = item.get("url") if isinstance(item, dict) else None
+    if not isinstance(url, str) or not url.startswith("/"):
+        return _error(HTTP_400_BAD_REQUEST, "Нужен url, начинающийся с /.")
+    if str(item.get("method", "GET")).upper() != "GET":
+        return _error(
+            HTTP_405_METHOD_NOT_ALLOWED,
+            "В пакете разрешены только GET-запросы.",
+        )
+    path, _, query = url.partition("?")
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return _not_found()
+    if match.namespace != API_NAMESPACE:
+        return _not_found()
+    if match.url_name == "batch":
+        return _error(HTTP_400_BAD_REQUEST, "Пакеты нельзя вкладывать.")
+    sub_request = SubRequest(request._request, path, query, request.user)
+    sub_request.resolver_match = match
+    view = match.func
+    allowed = (
+        allow_replica_for(view, "GET") and not sub_request.pinned_to_primary
+    )
+    if asyncio.iscoroutinefunction(view):
+        view = async_to_sync(view)
+    try:
+        with replica_reads(allowed):
+            response = view(sub_request, *match.args, **match.kwargs)
+        return {"status": response.status_code, "body": _body(response)}
+    except Http404:
+        return _not_found()
+    except Exception:
+        # Ошибка одного подзапроса не должна ронять весь пакет.
+        logger.exception("Ошибка подзапроса пакета %s", url)
+        return _error(HTTP_500_INTERNAL_SERVER_ERROR, "Ошибка сервера.")
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+LOCAL_CACHE_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+
+
+@register(Tags.caches)
+def check_shared_default_cache(app_configs, **kwargs) -> list[Error]:
+    """Кеш default должен быть общим для всех процессов.
+
+    В нем версия рецептов и множества флагов пользователей: в локальном
+    кеше каждый воркер сбрасывал бы только свою копию, а остальные до
+    USER_FLAGS_TTL отдавали бы старые ответы и флаги.
+    """
+    if settings.CACHES["default"]["BACKEND"] != LOCAL_CACHE_BACKEND:
+        return []
+    return [
+        Error(
+            "Кеш default хранит версию рецептов и флаги пользователей "
+            "и не может быть локальным для процесса.",
+            hint="Укажите в CACHE_BACKEND файловый или общий кеш.",
+            obj="CACHES['default']",
+            id="api.E001",
+        )
+    ]
@@ -0,0 +1,19 @@
+from django.core.files.uploadedfile import SimpleUploadedFile
+from drf_extra_fields.fields import Base64FieldMixin, Base64ImageField
+from rest_framework.exceptions import ValidationError
+
+
+class BinaryImageField(Base64ImageField):
+    """Картинка строкой base64 (JSON) или сырыми байтами (MessagePack)."""
+
+    def to_internal_value(self, data):
+        if not isinstance(data, bytes) or not data:
+            return super().to_internal_value(data)
+        file_name = self.get_file_name(data)
+        extension = self.get_file_extension(file_name, data)
+        if extension not in self.ALLOWED_TYPES:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        # Минуя разбор base64, сразу в ImageField.
+        return super(Base64FieldMixin, self).to_internal_value(
+            SimpleUploadedFile(name=f"{file_name}.{extension}", content=data)
+        )
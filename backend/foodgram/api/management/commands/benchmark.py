@@ -0,0 +1,299 @@
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request, urlopen
+
+from core.compression import available_encodings, compress, compress_reused
+from core.trigrams import ingredient_index
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client, RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.readers import (
+    build_recipes,
+    build_short_recipes,
+    recipe_values,
+    short_recipe_values,
+)
+from api.renderers import ORJSONRenderer
+from api.serializers import RecipeSerializer, ShortRecipeSerializer
+from recipes.models import Ingredient, Recipe
+
+User = get_user_model()
+
+COMPRESSION_PATHS = (
+    "/api/recipes/?limit=6",
+    "/api/recipes/?limit=50",
+    "/api/ingredients/",
+    "/api/tags/",
+)
+
+
+class Command(BaseCommand):
+    """
+    Замеры производительности API.
+    python3 manage.py benchmark http --url http://127.0.0.1:9000/api/tags/
+    """
+
+    help = "Benchmarks"
+
+    scenarios = (
+        "http",
+        "connections",
+        "ingredients",
+        "render",
+        "read",
+        "compression",
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=self.scenarios)
+        parser.add_argument("--url", action="append", default=[])
+        parser.add_argument("--path", default="/api/recipes/")
+        parser.add_argument("--token", default=None)
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--query", action="append", default=[])
+        parser.add_argument("--checks", type=int, default=200)
+
+    def handle(self, *args, **options):
+        getattr(self, f"bench_{options['scenario']}")(**options)
+
+    def report(self, name: str, timings: list[float], total: float) -> None:
+        """Печатает итог: запросов в секунду и перцентили задержки."""
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f"{name}: {len(timings) / total:.1f} req/s, "
+            f"p50 {statistics.median(timings) * 1000:.2f} ms, "
+            f"p95 {p95 * 1000:.2f} ms"
+        )
+
+    def bench_http(self, url, token, requests, concurrency, **options):
+        """Пропускная способность запущенного сервера (WSGI или ASGI).
+
+        Для сравнения запустите проект поочередно через
+        ``gunicorn foodgram.wsgi`` и ``gunicorn -k
+        uvicorn.workers.UvicornWorker foodgram.asgi:application``.
+        """
+        if not url:
+            raise CommandError("Укажите хотя бы один --url")
+        headers = {"Authorization": f"Token {token}"} if token else {}
+
+        def fetch(target: str) -> float:
+            start = time.perf_counter()
+            with urlopen(Request(target, headers=headers)) as response:
+                response.read()
+            return time.perf_counter() - start
+
+        for target in url:
+            with ThreadPoolExecutor(concurrency) as executor:
+                start = time.perf_counter()
+                timings = list(executor.map(fetch, [target] * requests))
+                total = time.perf_counter() - start
+            self.report(target, timings, total)
+
+    def bench_connections(self, path, requests, **options):
+        """Задержка запроса с новым, постоянным и пуловым соединением."""
+        client = Client(SERVER_NAME="localhost")
+        settings_dict = connection.settings_dict
+        saved = settings_dict["CONN_MAX_AGE"], settings_dict.get("POOL_SIZE")
+        modes = {
+            "new connection": (0, 0),
+            "persistent": (600, 0),
+            "pool": (0, saved[1] or 10),
+        }
+        try:
+            for name, (max_age, pool_size) in modes.items():
+                connection.close()
+                settings_dict["CONN_MAX_AGE"] = max_age
+                settings_dict["POOL_SIZE"] = pool_size
+                timings = []
+                start = time.perf_counter()
+                for _ in range(requests):
+                    request_start = time.perf_counter()
+                    # Границы HTTP-запроса, как в request_started/finished.
+                    close_old_connections()
+                    client.get(path)
+                    close_old_connections()
+                    timings.append(time.perf_counter() - request_start)
+                self.report(name, timings, time.perf_counter() - start)
+        finally:
+            connection.close()
+            settings_dict["CONN_MAX_AGE"], settings_dict["POOL_SIZE"] = saved
+
+    def bench_ingredients(self, query, requests, **options):
+        """Поиск ингредиентов: два запроса к БД против триграммного индекса.
+
+        Без --query берутся названия из справочника с опечаткой
+        в середине слова.
+        """
+        if not query:
+            names = list(Ingredient.objects.values_list("name", flat=True))
+            if not names:
+                raise CommandError("Справочник ингредиентов пуст")
+            random.seed(0)
+            for name in random.sample(names, min(len(names), 20)):
+                middle = len(name) // 2
+                query.append(name[:middle] + "и" + name[middle + 1:])
+
+        def database(name: str) -> list[dict]:
+            queryset = Ingredient.objects.values(
+                "id", "name", "measurement_unit"
+            )
+            starts = list(queryset.filter(name__istartswith=name))
+            contains = queryset.filter(name__icontains=name).exclude(
+                name__istartswith=name
+            )
+            return starts + list(contains)
+
+        ingredient_index.all()
+        for name, search in (
+            ("database", database),
+            ("trigram index", ingredient_index.search),
+        ):
+            timings = []
+            found = 0
+            start = time.perf_counter()
+            for idx in range(requests):
+                request_start = time.perf_counter()
+                found += bool(search(query[idx % len(query)]))
+                timings.append(time.perf_counter() - request_start)
+            self.report(name, timings, time.perf_counter() - start)
+            self.stdout.write(f"  запросов с результатом: {found}")
+
+    def bench_render(self, requests, **options):
+        """Рендеринг страниц RecipeSerializer из 6, 50 и 500 рецептов."""
+        recipes = list(
+            Recipe.objects.select_related("author").prefetch_related("tags")[
+                :500
+            ]
+        )
+        if not recipes:
+            raise CommandError("Нет рецептов")
+        request = Request(RequestFactory().get("/api/recipes/"))
+        for size in (6, 50, 500):
+            page = (recipes * (size // len(recipes) + 1))[:size]
+            start = time.perf_counter()
+            data = RecipeSerializer(
+                page, many=True, context={"request": request}
+            ).data
+            serialize = time.perf_counter() - start
+            self.stdout.write(
+                f"{size} рецептов, сериализация: {serialize * 1000:.2f} ms"
+            )
+            for renderer in (JSONRenderer(), ORJSONRenderer()):
+                timings = []
+                start = time.perf_counter()
+                for _ in range(max(requests // size, 10)):
+                    render_start = time.perf_counter()
+                    renderer.render(data, "application/json")
+                    timings.append(time.perf_counter() - render_start)
+                self.report(
+                    f"  {renderer.__class__.__name__}",
+                    timings,
+                    time.perf_counter() - start,
+                )
+
+    def bench_read(self, requests, checks, **options):
+        """RecipeSerializer против сборки ответа из .values().
+
+        Сначала ответы сравниваются побайтно на случайных страницах
+        для анонима и случайных пользователей.
+        """
+        queryset = Recipe.objects.select_related("author")
+        total = queryset.count()
+        if not total:
+            raise CommandError("Нет рецептов")
+        users = [AnonymousUser(), *User.objects.order_by("?")[:5]]
+        renderer = ORJSONRenderer()
+        random.seed(0)
+
+        def make_request(user) -> Request:
+            request = Request(RequestFactory().get("/api/recipes/"))
+            request.user = user
+            return request
+
+        for _ in range(checks):
+            request = make_request(random.choice(users))
+            offset = random.randrange(total)
+            size = random.choice((1, 6, 50))
+            page = queryset[offset:offset + size]
+            context = {"request": request}
+            pairs = (
+                (
+                    RecipeSerializer(page, many=True, context=context).data,
+                    build_recipes(list(recipe_values(page)), request),
+                ),
+                (
+                    ShortRecipeSerializer(
+                        page, many=True, context=context
+                    ).data,
+                    build_short_recipes(
+                        list(short_recipe_values(page)), request
+                    ),
+                ),
+            )
+            for expected, actual in pairs:
+                if renderer.render(expected) != renderer.render(actual):
+                    raise CommandError(
+                        f"Ответы различаются (offset={offset}, size={size}, "
+                        f"user={request.user}):\n{expected}\n{actual}"
+                    )
+        self.stdout.write(f"Ответы совпадают на {checks} страницах")
+
+        request = make_request(users[-1])
+        page = queryset[:50]
+        for name, build in (
+            (
+                "RecipeSerializer",
+                lambda: RecipeSerializer(
+                    page, many=True, context={"request": request}
+                ).data,
+            ),
+            (
+                "values",
+                lambda: build_recipes(list(recipe_values(page)), request),
+            ),
+        ):
+            timings = []
+            start = time.perf_counter()
+            for _ in range(max(requests // 50, 10)):
+                build_start = time.perf_counter()
+                renderer.render(build())
+                timings.append(time.perf_counter() - build_start)
+            self.report(name, timings, time.perf_counter() - start)
+
+    def bench_compression(self, requests, **options):
+        """Сжатие ответов: экономия байтов и время сжатия по эндпоинтам.
+
+        Тела ответов берутся без Accept-Encoding, затем каждое сжимается
+        всеми доступными кодировками и повторно из кеша сжатых ответов.
+        """
+        client = Client(SERVER_NAME="localhost")
+        for path in COMPRESSION_PATHS:
+            body = client.get(path).content
+            self.stdout.write(f"{path}: {len(body)} байт")
+            for encoding in available_encodings():
+                for name, method in (
+                    (encoding, compress),
+                    (f"{encoding} reused", compress_reused),
+                ):
+                    timings = []
+                    start = time.perf_counter()
+                    for _ in range(requests):
+                        compress_start = time.perf_counter()
+                        compressed = method(body, encoding)
+                        timings.append(time.perf_counter() - compress_start)
+                    self.report(
+                        f"  {name}", timings, time.perf_counter() - start
+                    )
+                saved = 1 - len(compressed) / max(len(body), 1)
+                self.stdout.write(
+                    f"    {len(compressed)} байт, экономия {saved:.0%}"
+                )
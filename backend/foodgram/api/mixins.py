@@ -3,6 +3,7 @@ from django.db.models import Model, Q
 from django.db.utils import IntegrityError
 from django.http import Http404
 from django.shortcuts import get_object_or_404
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
 from rest_framework.serializers import ModelSerializer
 from rest_framework.status import (
@@ -72,3 +73,44 @@ class AddDeleteMixin:
 
         obj.delete()
         return Response(status=HTTP_204_NO_CONTENT)
+
+
+class SparseFieldsMixin:
+    """Поля ответа по параметрам ?fields= и ?omit= (через запятую).
+
+    id остается в ответе всегда, неизвестные поля игнорируются.
+    """
+
+    def _param_names(self, name: str) -> set[str]:
+        return {
+            field.strip()
+            for value in self.request.query_params.getlist(name)
+            for field in value.split(",")
+            if field.strip()
+        }
+
+    def get_response_fields(self, available: tuple[str, ...]) -> tuple:
+        """Выбранные поля в порядке available."""
+        fields = self._param_names("fields")
+        omit = self._param_names("omit") - {"id"}
+        return tuple(
+            field
+            for field in available
+            if (not fields or field in fields or field == "id")
+            and field not in omit
+        )
+
+    def prune_fields(self, serializer: ModelSerializer) -> ModelSerializer:
+        """Убирает из сериализатора невыбранные поля."""
+        target = getattr(serializer, "child", serializer)
+        selected = set(self.get_response_fields(tuple(target.fields)))
+        for name in list(target.fields):
+            if name not in selected:
+                target.fields.pop(name)
+        return serializer
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.request.method in SAFE_METHODS:
+            self.prune_fields(serializer)
+        return serializer
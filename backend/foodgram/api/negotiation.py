@@ -0,0 +1,40 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.utils.mediatypes import _MediaType, media_type_matches
+
+
+def _refused(media_type: str) -> bool:
+    """Тип с q=0 клиент явно не принимает."""
+    try:
+        return float(_MediaType(media_type).params.get("q", 1)) == 0
+    except ValueError:
+        return False
+
+
+class QualityContentNegotiation(DefaultContentNegotiation):
+    """Согласование DRF, которое учитывает q=0 в заголовке Accept.
+
+    DRF не смотрит на q, и application/msgpack;q=0 выбрал бы MessagePack.
+    Тип с q=0 клиент не принимает: такие рендереры исключаются.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        refused = [
+            media_type
+            for media_type in super().get_accept_list(request)
+            if _refused(media_type)
+        ]
+        renderers = [
+            renderer
+            for renderer in renderers
+            if not any(
+                media_type_matches(renderer.media_type, media_type)
+                for media_type in refused
+            )
+        ]
+        return super().select_renderer(request, renderers, format_suffix)
+
+    def get_accept_list(self, request):
+        accepts = super().get_accept_list(request)
+        return [
+            media_type for media_type in accepts if not _refused(media_type)
+        ] or ["*/*"]
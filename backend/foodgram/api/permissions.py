@@ -1,3 +1,6 @@
+from ipaddress import ip_address, ip_network
+
+from django.conf import settings
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import SAFE_METHODS, BasePermission
 
@@ -51,3 +54,24 @@ class OwnerUserOrReadOnly(BasePermission):
             and request.user == obj.author
             and request.user.is_staff
         )
+
+
+class StaffOrInternalIP(BasePermission):
+    """Доступ только для Staff или из внутренней сети.
+
+    Адрес берется из REMOTE_ADDR. За nginx это адрес самого прокси, поэтому
+    /api/metrics закрыт в infra/nginx.conf, а METRICS_ALLOWED_NETWORKS
+    описывает сборщики метрик, которые ходят на backend напрямую.
+    """
+
+    def has_permission(self, request, view) -> bool:
+        if request.user.is_authenticated and request.user.is_staff:
+            return True
+        try:
+            address = ip_address(request.META.get("REMOTE_ADDR", ""))
+        except ValueError:
+            return False
+        return any(
+            address in ip_network(network)
+            for network in settings.METRICS_ALLOWED_NETWORKS
+        )
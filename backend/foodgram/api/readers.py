@@ -0,0 +1,202 @@
+"""Быстрое чтение рецептов без полей сериализаторов DRF.
+
+Строит те же словари, что RecipeSerializer и ShortRecipeSerializer,
+из строк ``.values()`` и нескольких запросов на всю страницу сразу:
+теги, ингредиенты, избранное, список покупок и подписки. Используется
+только на чтение, запись идет через RecipeSerializer.
+"""
+from collections import defaultdict
+
+from django.db.models import QuerySet
+
+from recipes.models import AmountIngredient, Carts, Favorites, Recipe
+from users.models import Subscriptions
+
+# Поля ответа в порядке RecipeSerializer.
+RECIPE_RESPONSE_FIELDS = (
+    "id",
+    "tags",
+    "author",
+    "ingredients",
+    "is_favorited",
+    "is_in_shopping_cart",
+    "name",
+    "image",
+    "text",
+    "cooking_time",
+)
+# Колонки, которые нужны полям ответа.
+RECIPE_COLUMNS = {
+    "id": ("id",),
+    "author": (
+        "author_id",
+        "author__email",
+        "author__username",
+        "author__first_name",
+        "author__last_name",
+    ),
+    "name": ("name",),
+    "image": ("image",),
+    "text": ("text",),
+    "cooking_time": ("cooking_time",),
+}
+SHORT_RECIPE_FIELDS = ("id", "name", "image", "cooking_time")
+
+
+def recipe_values(
+    queryset: QuerySet[Recipe], fields=RECIPE_RESPONSE_FIELDS
+) -> QuerySet[dict]:
+    """Строки рецептов только с колонками, нужными полям fields."""
+    columns = ["id"]
+    for field in fields:
+        columns.extend(RECIPE_COLUMNS.get(field, ()))
+    return queryset.values(*dict.fromkeys(columns))
+
+
+def short_recipe_values(
+    queryset: QuerySet, prefix: str = ""
+) -> QuerySet[dict]:
+    """Поля короткого рецепта; prefix — путь к рецепту от модели queryset."""
+    return queryset.values(*(prefix + field for field in SHORT_RECIPE_FIELDS))
+
+
+def image_url(name: str, request=None) -> str | None:
+    """Ссылка на картинку, как у ImageField сериализатора."""
+    if not name:
+        return None
+    url = Recipe._meta.get_field("image").storage.url(name)
+    if request is None:
+        return url
+    return request.build_absolute_uri(url)
+
+
+def _recipe_tags(recipe_ids: list[int]) -> dict[int, list]:
+    tags = defaultdict(list)
+    for row in (
+        Recipe.tags.through.objects.filter(recipe_id__in=recipe_ids)
+        .order_by("tag__name")
+        .values("recipe_id", "tag_id", "tag__name", "tag__color", "tag__slug")
+    ):
+        tags[row["recipe_id"]].append(
+            {
+                "id": row["tag_id"],
+                "name": row["tag__name"],
+                "color": row["tag__color"],
+                "slug": row["tag__slug"],
+            }
+        )
+    return tags
+
+
+def _recipe_ingredients(recipe_ids: list[int]) -> dict[int, list]:
+    ingredients = defaultdict(list)
+    for row in (
+        AmountIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .order_by("ingredients__name")
+        .values(
+            "recipe_id",
+            "ingredients_id",
+            "ingredients__name",
+            "ingredients__measurement_unit",
+            "amount",
+        )
+    ):
+        ingredients[row["recipe_id"]].append(
+            {
+                "id": row["ingredients_id"],
+                "name": row["ingredients__name"],
+                "measurement_unit": row["ingredients__measurement_unit"],
+                "amount": row["amount"],
+            }
+        )
+    return ingredients
+
+
+def _ids_in(queryset: QuerySet, field: str) -> set[int]:
+    return set(queryset.values_list(field, flat=True))
+
+
+def build_recipes(
+    rows: list[dict], request, fields=RECIPE_RESPONSE_FIELDS
+) -> list[dict]:
+    """Ответ RecipeSerializer для строк recipe_values.
+
+    Запросы выполняются только для полей из fields.
+    """
+    recipe_ids = [row["id"] for row in rows]
+    user = request.user
+    authenticated = user.is_authenticated
+    tags = _recipe_tags(recipe_ids) if "tags" in fields else {}
+    ingredients = (
+        _recipe_ingredients(recipe_ids) if "ingredients" in fields else {}
+    )
+    favorited = in_cart = subscribed = set()
+    if authenticated and "is_favorited" in fields:
+        favorited = _ids_in(
+            Favorites.objects.filter(user=user, recipe_id__in=recipe_ids),
+            "recipe_id",
+        )
+    if authenticated and "is_in_shopping_cart" in fields:
+        in_cart = _ids_in(
+            Carts.objects.filter(user=user, recipe_id__in=recipe_ids),
+            "recipe_id",
+        )
+    if authenticated and "author" in fields:
+        subscribed = _ids_in(
+            Subscriptions.objects.filter(
+                user=user, author_id__in={row["author_id"] for row in rows}
+            ),
+            "author_id",
+        )
+
+    builders = {
+        "id": lambda row: row["id"],
+        "tags": lambda row: tags.get(row["id"], []),
+        "author": lambda row: {
+            "email": row["author__email"],
+            "id": row["author_id"],
+            "username": row["author__username"],
+            "first_name": row["author__first_name"],
+            "last_name": row["author__last_name"],
+            "is_subscribed": row["author_id"] in subscribed,
+        },
+        "ingredients": lambda row: ingredients.get(row["id"], []),
+        "is_favorited": lambda row: row["id"] in favorited,
+        "is_in_shopping_cart": lambda row: row["id"] in in_cart,
+        "name": lambda row: row["name"],
+        "image": lambda row: image_url(row["image"], request),
+        "text": lambda row: row["text"],
+        "cooking_time": lambda row: row["cooking_time"],
+    }
+    selected = [(field, builders[field]) for field in fields]
+    return [{field: build(row) for field, build in selected} for row in rows]
+
+
+def build_short_recipes(
+    rows: list[dict], request=None, prefix: str = ""
+) -> list[dict]:
+    """Ответ ShortRecipeSerializer для строк short_recipe_values."""
+    return [
+        {
+            "id": row[prefix + "id"],
+            "name": row[prefix + "name"],
+            "image": image_url(row[prefix + "image"], request),
+            "cooking_time": row[prefix + "cooking_time"],
+        }
+        for row in rows
+    ]
+
+
+def read_recipes(
+    recipe_ids: list[int], request, fields=RECIPE_RESPONSE_FIELDS
+) -> list[dict]:
+    """Рецепты в порядке recipe_ids (пропуская удаленные)."""
+    rows = {
+        row["id"]: row
+        for row in recipe_values(
+            Recipe.objects.filter(pk__in=recipe_ids), fields
+        )
+    }
+    return build_recipes(
+        [rows[pk] for pk in recipe_ids if pk in rows], request, fields
+    )
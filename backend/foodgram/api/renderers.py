@@ -0,0 +1,56 @@
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+_encoder = JSONEncoder()
+
+
+def default(obj):
+    """Типы, которых нет в orjson: Decimal, ленивые строки, QuerySet."""
+    return _encoder.default(obj)
+
+
+def dumps(data) -> bytes:
+    """Сериализует данные ответа в JSON (UTF-8, без пробелов)."""
+    return orjson.dumps(data, default=default, option=OPTIONS)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """JSON-рендерер на orjson.
+
+    Словари сериализаторов (ReturnDict, OrderedDict) пишутся напрямую,
+    без промежуточных копий, datetime и UUID — средствами orjson.
+    """
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        option = OPTIONS
+        if accepted_media_type and "indent" in accepted_media_type:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=default, option=option)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Ответ в MessagePack для клиентов с Accept: application/msgpack.
+
+    Значения те же, что в JSON: даты и Decimal приводятся к строкам и
+    числам так же, как в ORJSONRenderer.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=default, use_bin_type=True)
@@ -1,19 +1,23 @@
 from collections import OrderedDict
 
-from core.features import create_recipe_ingredients
+from core.features import (
+    create_recipe_ingredients,
+    saving_recipe,
+    update_recipe_ingredients,
+)
 from core.validators import ingredients_validator, tags_validator
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.db.models import F, QuerySet
 from django.db.transaction import atomic
 from djoser.serializers import UserCreateSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework.serializers import (
     IntegerField,
     ModelSerializer,
     SerializerMethodField,
 )
 
+from .fields import BinaryImageField
 from recipes.models import Carts, Favorites, Ingredient, Recipe, Tag
 
 User = get_user_model()
@@ -93,7 +97,7 @@ class UserSubscribeSerializer(UserInfoSerializer):
         read_only_fields = ("__all__",)
 
     def get_recipes_count(self, obj: User) -> int:
-        return obj.recipes.count()
+        return obj.recipes_count
 
 
 class TagSerializer(ModelSerializer):
@@ -127,7 +131,7 @@ class RecipeSerializer(ModelSerializer):
     ingredients = SerializerMethodField()
     is_favorited = SerializerMethodField()
     is_in_shopping_cart = SerializerMethodField()
-    image = Base64ImageField()
+    image = BinaryImageField()
     cooking_time = IntegerField()
 
     class Meta:
@@ -178,7 +182,8 @@ class RecipeSerializer(ModelSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data["cooking_time"] = int(data["cooking_time"])
+        if "cooking_time" in data:
+            data["cooking_time"] = int(data["cooking_time"])
         return data
 
     def validate(self, data: OrderedDict) -> OrderedDict:
@@ -224,11 +229,10 @@ class RecipeSerializer(ModelSerializer):
             if hasattr(recipe, key):
                 setattr(recipe, key, value)
 
-        if tags:
-            recipe.tags.clear()
-            recipe.tags.set(tags)
-        if ingredients:
-            recipe.ingredients.clear()
-            create_recipe_ingredients(recipe, ingredients)
+        with saving_recipe(recipe.pk):
+            if tags:
+                recipe.tags.set(tags)
+            if ingredients:
+                update_recipe_ingredients(recipe, ingredients)
         recipe.save()
         return recipe
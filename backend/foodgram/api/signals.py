@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache_key
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance: Token, **kwargs) -> None:
+    """Сбрасывает кеш токена при выходе пользователя."""
+    cache.delete(token_cache_key(instance.key))
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(
+    sender, instance: User, update_fields=None, **kwargs
+) -> None:
+    """Сбрасывает кеш токенов изменённого или деактивированного юзера."""
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    keys = Token.objects.filter(user=instance).values_list("key", flat=True)
+    cache.delete_many([token_cache_key(key) for key in keys])
@@ -0,0 +1,61 @@
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.models import User
+
+SAFE_ONLY = (
+    "/api/tags/",
+    "/api/ingredients/",
+    "/api/recipes/download_shopping_cart/",
+)
+CART = "/api/recipes/download_shopping_cart/"
+
+
+class AsyncViewsTests(TestCase):
+    """Асинхронные вью отвечают на ошибки так же, как вьюсеты DRF."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create(
+            username="cart", email="cart@example.com"
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self) -> None:
+        for alias in ("default", "responses"):
+            caches[alias].clear()
+        self.client = APIClient()
+
+    def test_unsafe_methods_not_allowed(self) -> None:
+        for url in SAFE_ONLY:
+            for method in ("post", "put", "patch", "delete"):
+                with self.subTest(url=url, method=method):
+                    response = getattr(self.client, method)(url)
+                    self.assertEqual(response.status_code, 405)
+                    self.assertEqual(response["Allow"], "GET, HEAD")
+                    self.assertIn("detail", response.json())
+
+    def test_cart_requires_token(self) -> None:
+        response = self.client.get(CART)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], "Token")
+        self.assertEqual(
+            response.json(),
+            {"detail": "Учетные данные не были предоставлены."},
+        )
+
+    def test_cart_rejects_invalid_token(self) -> None:
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+        response = self.client.get(CART)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"detail": "Недопустимый токен."})
+
+    def test_cart_with_token(self) -> None:
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        response = self.client.get(CART)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            "cart_shopping_list.txt", response["Content-Disposition"]
+        )
@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Tag
+
+URL = "/api/batch/"
+
+
+class BatchViewTests(TestCase):
+    """Пакет GET-запросов: ограничения и статусы подзапросов."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        Tag.objects.create(name="Завтрак", color="#E26C2D", slug="breakfast")
+
+    def setUp(self) -> None:
+        for alias in ("default", "responses"):
+            caches[alias].clear()
+        self.client = APIClient()
+
+    def batch(self, *items, status: int = 200) -> list[dict] | None:
+        response = self.client.post(
+            URL, {"requests": list(items)}, format="json"
+        )
+        self.assertEqual(response.status_code, status, response.content)
+        if status == 200:
+            return response.json()["responses"]
+        return None
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_size_limit(self) -> None:
+        self.batch(*[{"url": "/api/tags/"}] * 3, status=400)
+        self.assertEqual(len(self.batch(*[{"url": "/api/tags/"}] * 2)), 2)
+
+    def test_empty_batch(self) -> None:
+        self.batch(status=400)
+
+    def test_item_statuses(self) -> None:
+        responses = self.batch(
+            {"url": "/api/tags/"},
+            {"url": "/api/recipes/99999/"},
+            {"url": "/api/users/me/"},
+            {"url": "/api/batch/"},
+            {"url": "/api/tags/", "method": "POST"},
+            {"url": "tags/"},
+            {"url": "/api/missing/"},
+        )
+        self.assertEqual(
+            [item["status"] for item in responses],
+            [200, 404, 401, 400, 405, 400, 404],
+        )
+        self.assertEqual(responses[0]["body"][0]["slug"], "breakfast")
+
+    def test_only_api_urls(self) -> None:
+        responses = self.batch({"url": "/admin/login/"})
+        self.assertEqual(responses[0]["status"], 404)
+
+    def test_failed_item_does_not_fail_batch(self) -> None:
+        with mock.patch(
+            "api.batch._body", side_effect=[RuntimeError("сбой"), []]
+        ):
+            responses = self.batch(
+                {"url": "/api/tags/"}, {"url": "/api/tags/"}
+            )
+        self.assertEqual([item["status"] for item in responses], [500, 200])
@@ -0,0 +1,98 @@
+import threading
+
+from core.cache import (
+    single_flight,
+    user_flags,
+    user_flags_version_key,
+    user_flags_versions,
+)
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Favorites, Ingredient, Recipe
+from users.models import User
+
+
+class UserFlagsTests(TestCase):
+    """Флаги пользователя сбрасываются для всех воркеров сразу."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create(
+            username="flags", email="flags@example.com"
+        )
+        cls.recipe = Recipe.objects.create(
+            name="Суп", author=cls.user, text="текст", cooking_time=10
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_other_worker_sees_reset(self) -> None:
+        # Отдельное подключение к default — кеш другого процесса.
+        other = caches.create_connection("default")
+        key = user_flags_version_key(self.user.pk, "favorites")
+        self.assertEqual(user_flags(self.user.pk)["favorites"], set())
+        version = other.get(key)
+        self.assertIsNotNone(version)
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorites.objects.create(user=self.user, recipe=self.recipe)
+        self.assertNotEqual(other.get(key), version)
+        self.assertEqual(
+            user_flags(self.user.pk)["favorites"], {self.recipe.pk}
+        )
+
+    def test_stale_set_written_after_commit_is_ignored(self) -> None:
+        # Чтение началось до коммита и записало старое множество позже.
+        versions = user_flags_versions(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorites.objects.create(user=self.user, recipe=self.recipe)
+        cache.set(
+            f"user:{self.user.pk}:favorites:{versions['favorites']}", set()
+        )
+        self.assertEqual(
+            user_flags(self.user.pk)["favorites"], {self.recipe.pk}
+        )
+
+
+class SingleFlightTests(TestCase):
+    """Промах пересчитывает один воркер, остальные ждут его значение."""
+
+    def test_waits_for_other_worker(self) -> None:
+        responses = caches[settings.RESPONSE_CACHE_ALIAS]
+        # Блокировку и значение пишет другой процесс через свои подключения.
+        other = caches.create_connection(settings.RESPONSE_CACHE_ALIAS)
+        caches[settings.LOCK_CACHE_ALIAS].add("lock:shared", "other", 30)
+        timer = threading.Timer(
+            0.2, other.set, ("shared", ("готово", 1, float("inf"), 0), None)
+        )
+        timer.start()
+        self.addCleanup(responses.delete, "shared")
+        try:
+            value = single_flight(
+                "test",
+                "shared",
+                lambda: self.fail("Значение считал второй воркер"),
+                version=1,
+                using=responses,
+            )
+        finally:
+            timer.cancel()
+        self.assertEqual(value, "готово")
+
+
+class IngredientSearchTests(TestCase):
+    """Поиск ингредиентов не ходит в БД, в кеш попадает только справочник."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        Ingredient.objects.create(name="соль", measurement_unit="г")
+
+    def test_search_without_queries(self) -> None:
+        client = APIClient()
+        client.get("/api/ingredients/?name=со")
+        with self.assertNumQueries(0):
+            response = client.get("/api/ingredients/?name=сол")
+        self.assertEqual(response.json()[0]["name"], "соль")
@@ -0,0 +1,23 @@
+from django.test import SimpleTestCase, override_settings
+
+from api.checks import LOCAL_CACHE_BACKEND, check_shared_default_cache
+
+
+class SharedDefaultCacheCheckTests(SimpleTestCase):
+    """Проверка api.E001 не пропускает локальный кеш default."""
+
+    @override_settings(CACHES={"default": {"BACKEND": LOCAL_CACHE_BACKEND}})
+    def test_local_default_cache(self) -> None:
+        errors = check_shared_default_cache(None)
+        self.assertEqual([error.id for error in errors], ["api.E001"])
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                "LOCATION": "foodgram_cache",
+            }
+        }
+    )
+    def test_shared_default_cache(self) -> None:
+        self.assertEqual(check_shared_default_cache(None), [])
@@ -0,0 +1,149 @@
+import gzip
+import random
+from unittest import mock
+
+import brotli
+from core import compression
+from core.compression import choose_encoding, compress_stream
+from core.middleware import CompressionMiddleware
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+BODY = b'{"name": "\xd1\x81\xd1\x83\xd0\xbf", "text": "' + b"x" * 4000 + b'"}'
+CHUNKS = (b"[", BODY, b",", BODY[:100], b"]")
+DECOMPRESS = {"gzip": gzip.decompress, "br": brotli.decompress}
+
+
+class ChooseEncodingTests(SimpleTestCase):
+    """Кодировка по Accept-Encoding с учетом q."""
+
+    def test_quality_values(self) -> None:
+        cases = (
+            ("", None),
+            ("identity", None),
+            ("gzip", "gzip"),
+            ("br", "br"),
+            ("gzip, br", "br"),
+            ("br;q=0, gzip", "gzip"),
+            ("br;q=0.5, gzip;q=0.8", "gzip"),
+            ("BR; Q=1, gzip;q=0.8", "br"),
+            ("br;q=0, gzip;q=0", None),
+            ("br;q=abc, gzip", "gzip"),
+            ("*", "br"),
+            ("*;q=0", None),
+            ("br;q=0, *", "gzip"),
+            ("gzip;q=0, *;q=0.5", "br"),
+            ("identity, *;q=0", None),
+            ("deflate, compress", None),
+        )
+        for header, expected in cases:
+            with self.subTest(header=header):
+                self.assertEqual(choose_encoding(header), expected)
+
+    def test_without_brotli(self) -> None:
+        with mock.patch.object(compression, "brotli", None):
+            self.assertEqual(choose_encoding("br, gzip;q=0.1"), "gzip")
+            self.assertIsNone(choose_encoding("br"))
+            self.assertEqual(choose_encoding("*"), "gzip")
+
+
+class CompressStreamTests(SimpleTestCase):
+    """Сжатый поток распаковывается в исходное тело."""
+
+    def test_round_trip(self) -> None:
+        for encoding, decompress in DECOMPRESS.items():
+            with self.subTest(encoding=encoding):
+                parts = list(compress_stream(iter(CHUNKS), encoding))
+                self.assertGreater(len(parts), 1)
+                self.assertEqual(decompress(b"".join(parts)), b"".join(CHUNKS))
+
+    def test_empty_stream(self) -> None:
+        for encoding, decompress in DECOMPRESS.items():
+            with self.subTest(encoding=encoding):
+                parts = compress_stream(iter(()), encoding)
+                self.assertEqual(decompress(b"".join(parts)), b"")
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Порог размера, типы, ETag и Vary у сжатых ответов."""
+
+    def process(
+        self, response: HttpResponse, accept_encoding: str = "gzip, br"
+    ) -> HttpResponse:
+        request = RequestFactory().get(
+            "/api/recipes/", HTTP_ACCEPT_ENCODING=accept_encoding
+        )
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def json_response(self, body: bytes = BODY, **kwargs) -> HttpResponse:
+        response = HttpResponse(
+            body, content_type="application/json", **kwargs
+        )
+        response["ETag"] = '"abc"'
+        return response
+
+    def test_compresses(self) -> None:
+        for encoding, decompress in DECOMPRESS.items():
+            with self.subTest(encoding=encoding):
+                response = self.process(self.json_response(), encoding)
+                self.assertEqual(response["Content-Encoding"], encoding)
+                self.assertEqual(decompress(response.content), BODY)
+                self.assertEqual(
+                    response["Content-Length"], str(len(response.content))
+                )
+                self.assertEqual(response["ETag"], 'W/"abc"')
+                self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_weak_etag_is_kept(self) -> None:
+        response = self.json_response()
+        response["ETag"] = 'W/"abc"'
+        self.assertEqual(self.process(response)["ETag"], 'W/"abc"')
+
+    def test_size_threshold(self) -> None:
+        small = self.process(self.json_response(BODY[:1023]))
+        self.assertFalse(small.has_header("Content-Encoding"))
+        self.assertFalse(small.has_header("Vary"))
+        self.assertEqual(small["ETag"], '"abc"')
+        large = self.process(self.json_response(BODY[:1024]))
+        self.assertEqual(large["Content-Encoding"], "br")
+
+    def test_not_accepted(self) -> None:
+        response = self.process(self.json_response(), "identity")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, BODY)
+        self.assertEqual(response["ETag"], '"abc"')
+        # Ответ зависит от Accept-Encoding, даже если не сжат.
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_skips_other_types_and_encoded(self) -> None:
+        html = HttpResponse(BODY, content_type="text/html")
+        self.assertFalse(self.process(html).has_header("Content-Encoding"))
+        encoded = self.json_response()
+        encoded["Content-Encoding"] = "gzip"
+        self.assertEqual(self.process(encoded).content, BODY)
+
+    def test_incompressible_body_is_sent_as_is(self) -> None:
+        body = random.Random(1).randbytes(2048)
+        for encoding in DECOMPRESS:
+            with self.subTest(encoding=encoding):
+                response = self.process(self.json_response(body), encoding)
+                self.assertFalse(response.has_header("Content-Encoding"))
+                self.assertEqual(response.content, body)
+                self.assertEqual(response["ETag"], '"abc"')
+
+    def test_streaming(self) -> None:
+        for encoding, decompress in DECOMPRESS.items():
+            with self.subTest(encoding=encoding):
+                response = StreamingHttpResponse(
+                    iter(CHUNKS), content_type="application/json"
+                )
+                response["Content-Length"] = "1"
+                response = self.process(response, encoding)
+                self.assertEqual(response["Content-Encoding"], encoding)
+                self.assertFalse(response.has_header("Content-Length"))
+                self.assertIn("Accept-Encoding", response["Vary"])
+                self.assertEqual(
+                    decompress(b"".join(response.streaming_content)),
+                    b"".join(CHUNKS),
+                )
@@ -0,0 +1,94 @@
+import random
+
+from core.features import filter_by_tag_slugs, filter_by_tags
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Favorites, Recipe, Tag
+from users.models import User
+
+PAGE = "/api/recipes/?limit=2&page=1"
+
+
+class RecipesEtagTests(TestCase):
+    """ETag списка рецептов зависит только от запрошенной страницы."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create(
+            username="etag", email="etag@example.com"
+        )
+        cls.tags = [
+            Tag.objects.create(
+                name=f"тег {idx}", color=f"#00000{idx}", slug=f"etag-{idx}"
+            )
+            for idx in range(3)
+        ]
+        rng = random.Random(3)
+        cls.recipes = []
+        for idx in range(6):
+            recipe = Recipe.objects.create(
+                name=f"Рецепт {idx}",
+                author=cls.user,
+                text="текст",
+                cooking_time=10,
+            )
+            recipe.tags.set(rng.sample(cls.tags, rng.randint(0, 3)))
+            cls.recipes.append(recipe)
+
+    def setUp(self) -> None:
+        # Ответы и флаги в общих кешах могли остаться от других тестов.
+        for alias in ("default", "responses"):
+            caches[alias].clear()
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_flags_outside_page_keep_etag(self) -> None:
+        etag = self.client.get(PAGE)["ETag"]
+        page_ids = {
+            recipe.pk
+            for recipe in Recipe.objects.all()[:2]
+        }
+        outside = next(
+            recipe for recipe in self.recipes if recipe.pk not in page_ids
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorites.objects.create(user=self.user, recipe=outside)
+        self.assertEqual(
+            self.client.get(PAGE, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        inside = Recipe.objects.get(pk=min(page_ids))
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorites.objects.create(user=self.user, recipe=inside)
+        self.assertEqual(
+            self.client.get(PAGE, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_not_modified_with_tags_in_one_query(self) -> None:
+        client = APIClient()
+        url = f"/api/recipes/?tags={self.tags[0].slug}&tags=missing"
+        etag = client.get(url)["ETag"]
+        with self.assertNumQueries(1):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_tag_slugs_filter_matches_tags_filter(self) -> None:
+        slugs = [tag.slug for tag in self.tags] + ["missing"]
+        rng = random.Random(5)
+        for _ in range(30):
+            chosen = rng.sample(slugs, rng.randint(1, len(slugs)))
+            match_all = rng.random() < 0.5
+            with self.subTest(slugs=chosen, match_all=match_all):
+                self.assertEqual(
+                    list(
+                        filter_by_tag_slugs(
+                            Recipe.objects.all(), chosen, match_all
+                        )
+                    ),
+                    list(
+                        filter_by_tags(Recipe.objects.all(), chosen, match_all)
+                    ),
+                )
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta, timezone
+
+from core.feed import decode_cursor, encode_cursor, fan_out_pending, get_feed
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import FanOutJob, FeedEntry, Recipe
+from users.models import Subscriptions, User
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@override_settings(FEED_CELEBRITY_FOLLOWERS=2)
+class FeedTests(TestCase):
+    """Раскладка по лентам, слияние с подмешиванием и курсор."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.reader, cls.other, cls.author, cls.celebrity = (
+            User.objects.create(username=name, email=f"{name}@example.com")
+            for name in ("reader", "other", "author", "celebrity")
+        )
+        Subscriptions.objects.create(user=cls.reader, author=cls.author)
+        Subscriptions.objects.create(user=cls.reader, author=cls.celebrity)
+        Subscriptions.objects.create(user=cls.other, author=cls.celebrity)
+
+    def setUp(self) -> None:
+        for alias in ("default", "responses"):
+            caches[alias].clear()
+
+    def create_recipes(self, author: User, count: int) -> list[Recipe]:
+        return [
+            Recipe.objects.create(
+                name=f"{author.username} {idx}",
+                author=author,
+                text="текст",
+                cooking_time=10,
+            )
+            for idx in range(count)
+        ]
+
+    def publish(self, recipes: list[Recipe], dates: list[datetime]) -> None:
+        """Задает даты публикации и раскладывает рецепты по лентам."""
+        for recipe, pub_date in zip(recipes, dates):
+            Recipe.objects.filter(pk=recipe.pk).update(pub_date=pub_date)
+        fan_out_pending(0)
+
+    def test_job_is_kept_until_fan_out(self) -> None:
+        (recipe,) = self.create_recipes(self.author, 1)
+        self.assertTrue(FanOutJob.objects.filter(recipe=recipe).exists())
+        self.assertFalse(FeedEntry.objects.exists())
+
+        self.assertEqual(fan_out_pending(60), (0, 0))
+        self.assertEqual(fan_out_pending(0), (1, 0))
+        self.assertFalse(FanOutJob.objects.exists())
+        self.assertEqual(
+            list(FeedEntry.objects.values_list("user_id", "recipe_id")),
+            [(self.reader.pk, recipe.pk)],
+        )
+
+    def test_celebrity_recipes_are_not_pushed(self) -> None:
+        self.create_recipes(self.celebrity, 2)
+        self.assertEqual(fan_out_pending(0), (2, 0))
+        self.assertFalse(FanOutJob.objects.exists())
+        self.assertFalse(FeedEntry.objects.exists())
+
+    def test_pages_merge_pushed_and_pulled(self) -> None:
+        pushed = self.create_recipes(self.author, 4)
+        pulled = self.create_recipes(self.celebrity, 4)
+        # Совпадающие даты у разных авторов упорядочиваются по id.
+        self.publish(
+            pushed, [START + timedelta(hours=hour) for hour in (0, 2, 2, 5)]
+        )
+        self.publish(
+            pulled, [START + timedelta(hours=hour) for hour in (1, 2, 5, 6)]
+        )
+        expected = list(
+            Recipe.objects.filter(
+                author__in=(self.author, self.celebrity)
+            ).values_list("pk", flat=True)
+        )
+        for limit in (1, 2, 3, 8):
+            with self.subTest(limit=limit):
+                recipe_ids, cursor = [], None
+                while True:
+                    page, next_key = get_feed(self.reader, limit, cursor)
+                    recipe_ids.extend(page)
+                    if next_key is None:
+                        break
+                    cursor = decode_cursor(encode_cursor(next_key))
+                self.assertEqual(recipe_ids, expected)
+
+    def test_cursor_round_trip(self) -> None:
+        key = (START + timedelta(microseconds=5), 42)
+        self.assertEqual(decode_cursor(encode_cursor(key)), key)
+        for cursor in ("", "bm90LWEtY3Vyc29y", "!!!"):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+    def test_invalid_cursor_is_not_found(self) -> None:
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        response = client.get("/api/recipes/feed/", {"cursor": "!!!"})
+        self.assertEqual(response.status_code, 404)
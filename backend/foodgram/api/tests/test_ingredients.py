@@ -0,0 +1,42 @@
+from core.features import update_recipe_ingredients
+from django.test import TestCase
+
+from recipes.models import AmountIngredient, Ingredient, Recipe
+from users.models import User
+
+
+class UpdateRecipeIngredientsTests(TestCase):
+    """Замена ингредиентов обновляет рецепт один раз, а не на каждую строку."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        author = User.objects.create(
+            username="cook", email="cook@example.com"
+        )
+        cls.recipe = Recipe.objects.create(
+            name="Суп", author=author, text="текст", cooking_time=10
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f"ингредиент {idx}", measurement_unit="г"
+            )
+            for idx in range(20)
+        ]
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(recipe=cls.recipe, ingredients=item, amount=1)
+            for item in cls.ingredients[:10]
+        )
+
+    def test_replace_all(self) -> None:
+        new = {item.pk: (item, 2) for item in self.ingredients[10:]}
+        # Чтение строк, удаление, вставка, похожие рецепты и дата изменения.
+        with self.assertNumQueries(6):
+            update_recipe_ingredients(self.recipe, new)
+        self.assertEqual(
+            set(
+                AmountIngredient.objects.filter(
+                    recipe=self.recipe
+                ).values_list("ingredients_id", flat=True)
+            ),
+            set(new),
+        )
@@ -0,0 +1,49 @@
+import msgpack
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Tag
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+HTML = "text/html; charset=utf-8"
+
+
+class ContentNegotiationTests(TestCase):
+    """Формат ответа выбирается по Accept с учетом q=0."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        Tag.objects.create(name="Завтрак", color="#E26C2D", slug="breakfast")
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def test_catalogue(self) -> None:
+        cases = (
+            (MSGPACK, MSGPACK),
+            (f"{MSGPACK};q=0", JSON),
+            (f"{MSGPACK};q=0, {JSON}", JSON),
+            (f"{JSON};q=0, {MSGPACK}", MSGPACK),
+            ("text/html,*/*;q=0.8", HTML),
+        )
+        for url in ("/api/tags/", "/api/ingredients/"):
+            for accept, expected in cases:
+                with self.subTest(url=url, accept=accept):
+                    response = self.client.get(url, HTTP_ACCEPT=accept)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response["Content-Type"], expected)
+                    self.assertIn("Accept", response["Vary"])
+
+    def test_catalogue_not_acceptable(self) -> None:
+        response = self.client.get("/api/tags/", HTTP_ACCEPT="text/csv")
+        self.assertEqual(response.status_code, 406)
+
+    def test_viewset(self) -> None:
+        response = self.client.get("/api/recipes/", HTTP_ACCEPT=MSGPACK)
+        self.assertEqual(response["Content-Type"], MSGPACK)
+        self.assertIn("results", msgpack.unpackb(response.content))
+        response = self.client.get(
+            "/api/recipes/", HTTP_ACCEPT=f"{MSGPACK};q=0"
+        )
+        self.assertEqual(response["Content-Type"], JSON)
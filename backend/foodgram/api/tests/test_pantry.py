@@ -0,0 +1,116 @@
+from unittest import mock
+
+import numpy as np
+from core.features import create_recipe_ingredients, update_recipe_ingredients
+from core.pantry import CHANGE_KEY, VERSION_KEY, PantryIndex, journal
+from django.test import TestCase, override_settings
+
+from recipes.models import AmountIngredient, Ingredient, Recipe
+from users.models import User
+
+
+def snapshot(index: PantryIndex) -> tuple[dict, list]:
+    """Содержимое индекса без пустых списков и нулей в конце."""
+    postings = {
+        ingredient: recipes.tolist()
+        for ingredient, recipes in index._postings.items()
+        if len(recipes)
+    }
+    return postings, np.trim_zeros(index._sizes, "b").tolist()
+
+
+class PantryJournalTests(TestCase):
+    """Индекс, догнавший журнал, совпадает с построенным заново."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = User.objects.create(
+            username="pantry", email="pantry@example.com"
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f"ингредиент {idx}", measurement_unit="г"
+            )
+            for idx in range(6)
+        ]
+        cls.recipes = [
+            cls.create_recipe(f"Рецепт {idx}", positions)
+            for idx, positions in enumerate(((0, 1, 2), (1, 2), (3,), (4, 5)))
+        ]
+
+    @classmethod
+    def create_recipe(cls, name: str, positions: tuple[int, ...]) -> Recipe:
+        recipe = Recipe.objects.create(
+            name=name, author=cls.author, text="текст", cooking_time=10
+        )
+        create_recipe_ingredients(recipe, cls.amounts(positions))
+        return recipe
+
+    @classmethod
+    def amounts(cls, positions: tuple[int, ...]) -> dict:
+        return {
+            cls.ingredients[position].pk: (cls.ingredients[position], 1)
+            for position in positions
+        }
+
+    def setUp(self) -> None:
+        self.index = PantryIndex()
+        self.index.sync()
+
+    def assertMatchesBuild(self) -> None:
+        fresh = PantryIndex()
+        fresh._build()
+        self.assertEqual(snapshot(self.index), snapshot(fresh))
+
+    def replay(self) -> None:
+        with mock.patch.object(
+            self.index, "_build", side_effect=AssertionError("rebuild")
+        ):
+            self.index.sync()
+
+    def test_replay_edits_and_deletes(self) -> None:
+        first, second, third, _ = self.recipes
+        # Раскладка по лентам после коммита тут не нужна.
+        recipe = Recipe.objects.create(
+            name="Новый", author=self.author, text="текст", cooking_time=10
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            update_recipe_ingredients(first, self.amounts((2, 3)))
+            AmountIngredient.objects.filter(recipe=third).delete()
+            second.delete()
+            create_recipe_ingredients(recipe, self.amounts((0, 5)))
+        self.replay()
+        self.assertMatchesBuild()
+        self.assertEqual(self.index._version, journal().get(VERSION_KEY))
+
+    def test_replay_is_idempotent(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            update_recipe_ingredients(self.recipes[0], self.amounts((5,)))
+        self.replay()
+        # Повторное применение тех же рецептов ничего не меняет.
+        self.index._apply({self.recipes[0].pk, self.recipes[3].pk})
+        self.assertMatchesBuild()
+
+    def test_gap_rebuilds(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            update_recipe_ingredients(self.recipes[0], self.amounts((4,)))
+            update_recipe_ingredients(self.recipes[1], self.amounts((0,)))
+        journal().delete(CHANGE_KEY.format(self.index._version + 1))
+        with mock.patch.object(
+            self.index, "_build", wraps=self.index._build
+        ) as build:
+            self.index.sync()
+        build.assert_called_once()
+        self.assertMatchesBuild()
+
+    @override_settings(PANTRY_MAX_REPLAY=1)
+    def test_long_journal_rebuilds(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            for recipe in self.recipes[:3]:
+                update_recipe_ingredients(recipe, self.amounts((5,)))
+        with mock.patch.object(
+            self.index, "_build", wraps=self.index._build
+        ) as build:
+            self.index.sync()
+        build.assert_called_once()
+        self.assertMatchesBuild()
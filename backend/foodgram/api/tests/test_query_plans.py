@@ -0,0 +1,187 @@
+"""Планы запросов горячих путей API в PostgreSQL.
+
+Тест наполняет тестовую БД синтетическими данными и проверяет, что
+большие таблицы читаются по индексам, а не последовательно. Данные
+создаются пачками, поэтому производные поля заполняются после вставки.
+"""
+import random
+from unittest import skipUnless
+
+from core.features import (
+    recount_counters,
+    refresh_tags_mask,
+    shopping_list_ingredients,
+)
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from rest_framework.request import Request
+
+from api.views import RecipeViewSet
+from recipes.models import (
+    AmountIngredient,
+    Carts,
+    Favorites,
+    Ingredient,
+    Recipe,
+    Tag,
+)
+from users.models import Subscriptions, User
+
+PAGE_SIZE = 6
+SEED_RECIPES = 30000
+# Таблицы меньше этого числа строк можно читать последовательно.
+MIN_ROWS = 10000
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Таблицы, которые план читает последовательно."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", ()):
+        found.extend(seq_scans(child))
+    return found
+
+
+def explain(queryset) -> dict:
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        return cursor.fetchone()[0][0]["Plan"]
+
+
+def estimated_rows(table: str) -> float:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE relname = %s", (table,)
+        )
+        row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def recipes_page(user: User, **params):
+    """Queryset списка рецептов, как его строит RecipeViewSet."""
+    request = Request(RequestFactory().get("/api/recipes/", params))
+    request.user = user
+    view = RecipeViewSet(request=request, format_kwarg=None)
+    view.action = "list"
+    return view.get_queryset()[:PAGE_SIZE]
+
+
+def hot_paths(user: User, author: User):
+    recipe = Recipe.objects.filter(author=author).first()
+    tag = Tag.objects.first()
+    yield "Главная страница", recipes_page(user)
+    yield "Рецепты автора", recipes_page(user, author=author.pk)
+    yield "Избранное", recipes_page(user, is_favorited="1")
+    yield "Список покупок", recipes_page(user, is_in_shopping_cart="1")
+    yield "Фильтр по тегу", recipes_page(user, tags=tag.slug)
+    yield "is_favorited", Favorites.objects.filter(recipe=recipe, user=user)
+    yield "is_in_shopping_cart", Carts.objects.filter(
+        recipe=recipe, user=user
+    )
+    yield "Подписки", User.objects.filter(subscriptions__user=user)[
+        :PAGE_SIZE
+    ]
+    yield "Рецепты в подписках", Recipe.objects.filter(author=author)
+    yield "is_subscribed", Subscriptions.objects.filter(
+        author=author, user=user
+    )
+    yield "Скачивание списка покупок", shopping_list_ingredients(user)
+
+
+def seed(total: int) -> None:
+    """Создает total рецептов со связанными данными."""
+    rng = random.Random(0)
+    users = User.objects.bulk_create(
+        User(
+            username=f"explain_{idx}",
+            email=f"explain_{idx}@example.com",
+            first_name="Explain",
+            last_name="Seed",
+            password="!",
+        )
+        for idx in range(total // 50)
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f"explain {idx}", measurement_unit="г")
+        for idx in range(200)
+    )
+    tags = Tag.objects.bulk_create(
+        Tag(name=f"тег {idx}", color=f"#00000{idx}", slug=f"tag-{idx}")
+        for idx in range(5)
+    )
+    recipes = Recipe.objects.bulk_create(
+        (
+            Recipe(
+                name=f"Explain {idx}",
+                author=rng.choice(users),
+                text="explain",
+                cooking_time=rng.randint(1, 300),
+            )
+            for idx in range(total)
+        ),
+        batch_size=5000,
+    )
+    AmountIngredient.objects.bulk_create(
+        (
+            AmountIngredient(recipe=recipe, ingredients=ingredient, amount=1)
+            for recipe in recipes
+            for ingredient in rng.sample(ingredients, 5)
+        ),
+        batch_size=5000,
+    )
+    Recipe.tags.through.objects.bulk_create(
+        (
+            Recipe.tags.through(recipe=recipe, tag=rng.choice(tags))
+            for recipe in recipes
+        ),
+        batch_size=5000,
+    )
+    for model in (Favorites, Carts):
+        model.objects.bulk_create(
+            (
+                model(user=user, recipe=recipe)
+                for user in users
+                for recipe in rng.sample(recipes, 20)
+            ),
+            batch_size=5000,
+            ignore_conflicts=True,
+        )
+    Subscriptions.objects.bulk_create(
+        (
+            Subscriptions(user=user, author=author)
+            for user in users
+            for author in rng.sample(users, 5)
+            if author != user
+        ),
+        batch_size=5000,
+        ignore_conflicts=True,
+    )
+    # bulk_create не вызывает сигналы: маски и счетчики считаются здесь.
+    refresh_tags_mask({recipe.pk for recipe in recipes})
+    recount_counters()
+
+
+@skipUnless(connection.vendor == "postgresql", "Нужен PostgreSQL")
+class HotPathPlansTests(TestCase):
+    """Большие таблицы на горячих путях читаются по индексам."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        seed(SEED_RECIPES)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        subscription = Subscriptions.objects.order_by("pk").first()
+        cls.user = subscription.user
+        cls.author = subscription.author
+
+    def test_no_seq_scans_on_large_tables(self) -> None:
+        for name, queryset in hot_paths(self.user, self.author):
+            with self.subTest(name):
+                large = [
+                    table
+                    for table in seq_scans(explain(queryset))
+                    if estimated_rows(table) >= MIN_ROWS
+                ]
+                self.assertEqual(large, [], f"Seq Scan: {name}")
@@ -0,0 +1,175 @@
+"""Ответы из .values() совпадают с ответами сериализаторов побайтно.
+
+Данные и запросы генерируются случайно с фиксированным зерном: страницы
+разного размера, аноним и пользователи с избранным, списком покупок и
+подписками, произвольные ?fields= и ?omit=.
+"""
+import random
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, TestCase
+from rest_framework.request import Request
+
+from api.readers import (
+    RECIPE_RESPONSE_FIELDS,
+    build_recipes,
+    build_short_recipes,
+    recipe_values,
+    short_recipe_values,
+)
+from api.renderers import ORJSONRenderer
+from api.serializers import RecipeSerializer, ShortRecipeSerializer
+from api.views import RecipeViewSet
+from recipes.models import (
+    AmountIngredient,
+    Carts,
+    Favorites,
+    Ingredient,
+    Recipe,
+    Tag,
+)
+from users.models import Subscriptions, User
+
+CASES = 60
+TEXTS = ("", "суп", 'с "кавычками"\nи переносом', "emoji 🍲", "x" * 300)
+
+
+class ReadersMatchSerializersTests(TestCase):
+    """build_recipes и build_short_recipes против сериализаторов DRF."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        rng = random.Random(42)
+        cls.users = [
+            User.objects.create(
+                username=f"reader{idx}",
+                email=f"reader{idx}@example.com",
+                first_name="Иван",
+                last_name="Петров",
+            )
+            for idx in range(6)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f"тег {idx}", color=f"#A0A0A{idx}", slug=f"tag-{idx}"
+            )
+            for idx in range(4)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f"ингредиент {idx}", measurement_unit=unit
+            )
+            for idx, unit in enumerate(("г", "мл", "шт") * 5)
+        ]
+        recipes = []
+        for idx in range(40):
+            recipe = Recipe.objects.create(
+                name=f"Рецепт {idx}",
+                author=rng.choice(cls.users),
+                text=rng.choice(TEXTS) or "текст",
+                cooking_time=rng.randint(1, 300),
+                image=rng.choice(("", f"recipes_images/{idx}.png")),
+            )
+            recipe.tags.set(rng.sample(tags, rng.randint(0, len(tags))))
+            AmountIngredient.objects.bulk_create(
+                AmountIngredient(
+                    recipe=recipe,
+                    ingredients=ingredient,
+                    amount=rng.randint(1, 1000),
+                )
+                for ingredient in rng.sample(ingredients, rng.randint(0, 6))
+            )
+            recipes.append(recipe)
+        for user in cls.users:
+            for model in (Favorites, Carts):
+                for recipe in rng.sample(recipes, rng.randint(0, 15)):
+                    model.objects.create(user=user, recipe=recipe)
+            for author in rng.sample(cls.users, 3):
+                if author != user:
+                    Subscriptions.objects.create(user=user, author=author)
+
+    def setUp(self) -> None:
+        self.rng = random.Random(7)
+        self.renderer = ORJSONRenderer()
+
+    def random_view(self) -> RecipeViewSet:
+        """Вьюсет с запросом случайного пользователя и полей."""
+        params = {}
+        fields = self.rng.sample(
+            RECIPE_RESPONSE_FIELDS, self.rng.randint(1, 4)
+        )
+        mode = self.rng.choice(("", "fields", "omit"))
+        if mode:
+            params[mode] = ",".join(fields)
+        request = Request(RequestFactory().get("/api/recipes/", params))
+        request.user = self.rng.choice((AnonymousUser(), *self.users))
+        view = RecipeViewSet(request=request, format_kwarg=None)
+        view.action = "list"
+        return view
+
+    def random_page(self):
+        total = Recipe.objects.count()
+        offset = self.rng.randrange(total)
+        size = self.rng.choice((1, 6, 50))
+        return Recipe.objects.select_related("author")[offset:offset + size]
+
+    def assertSameBytes(self, expected, actual) -> None:
+        self.assertEqual(
+            self.renderer.render(expected), self.renderer.render(actual)
+        )
+
+    def test_recipes(self) -> None:
+        for case in range(CASES):
+            view = self.random_view()
+            page = self.random_page()
+            with self.subTest(
+                case=case,
+                user=view.request.user,
+                params=view.request.query_params.dict(),
+            ):
+                serializer = view.prune_fields(
+                    RecipeSerializer(
+                        page, many=True, context={"request": view.request}
+                    )
+                )
+                fields = view.get_response_fields(RECIPE_RESPONSE_FIELDS)
+                self.assertSameBytes(
+                    serializer.data,
+                    build_recipes(
+                        list(recipe_values(page, fields)),
+                        view.request,
+                        fields,
+                    ),
+                )
+
+    def test_short_recipes(self) -> None:
+        for case in range(CASES):
+            view = self.random_view()
+            page = self.random_page()
+            with self.subTest(case=case, user=view.request.user):
+                self.assertSameBytes(
+                    ShortRecipeSerializer(
+                        page, many=True, context={"request": view.request}
+                    ).data,
+                    build_short_recipes(
+                        list(short_recipe_values(page)), view.request
+                    ),
+                )
+
+    def test_short_recipes_through_relation(self) -> None:
+        for user in self.users:
+            favorites = Favorites.objects.filter(user=user).order_by("pk")
+            request = Request(RequestFactory().get("/api/users/"))
+            with self.subTest(user=user):
+                self.assertSameBytes(
+                    ShortRecipeSerializer(
+                        [favorite.recipe for favorite in favorites],
+                        many=True,
+                        context={"request": request},
+                    ).data,
+                    build_short_recipes(
+                        list(short_recipe_values(favorites, "recipe__")),
+                        request,
+                        "recipe__",
+                    ),
+                )
@@ -0,0 +1,165 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from core.middleware import ReplicaRoutingMiddleware
+from core.routers import _down_until, replica_read
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import ResolverMatch
+from rest_framework.request import Request
+
+from api.batch import run_subrequest
+from api.views import BatchView, download_shopping_cart, tags_list
+from recipes.models import Recipe
+
+REPLICA = "replica_test"
+DOWN = "replica_down"
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTests(SimpleTestCase):
+    """Чтение с реплики, закрепление писавших и откат на основную БД.
+
+    Реплики — отдельные локальные SQLite: рабочая во временном каталоге
+    и недоступная по несуществующему пути.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Реплики подключаются после проверок SimpleTestCase: это не
+        # тестовые копии основной БД, а отдельные файлы.
+        super().setUpClass()
+        cls.directory = Path(tempfile.mkdtemp())
+        connections.settings[REPLICA] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": cls.directory / "replica.sqlite3",
+        }
+        connections.settings[DOWN] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": cls.directory / "missing" / "replica.sqlite3",
+        }
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        for alias in (REPLICA, DOWN):
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        cache.clear()
+        _down_until.clear()
+        self.factory = RequestFactory()
+
+    def route(
+        self,
+        method: str = "get",
+        view=tags_list,
+        status: int = 200,
+        token: str = "Token first",
+    ) -> tuple[str, bool]:
+        """БД для чтения и закрепление внутри запроса через middleware."""
+        seen = {}
+
+        def get_response(request) -> HttpResponse:
+            middleware.process_view(request, view, (), {})
+            seen["db"] = router.db_for_read(Recipe)
+            seen["pinned"] = getattr(request, "pinned_to_primary", False)
+            return HttpResponse(status=status)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        request = getattr(self.factory, method)(
+            "/api/tags/", HTTP_AUTHORIZATION=token
+        )
+        middleware(request)
+        return seen["db"], seen["pinned"]
+
+    def test_safe_read_uses_replica(self) -> None:
+        self.assertEqual(self.route(), (REPLICA, False))
+
+    def test_view_without_replica_read_uses_primary(self) -> None:
+        self.assertEqual(
+            self.route(view=download_shopping_cart), ("default", False)
+        )
+
+    def test_unsafe_request_uses_primary(self) -> None:
+        self.assertEqual(self.route("post")[0], "default")
+
+    def test_write_pins_client_to_primary(self) -> None:
+        self.route("post", status=201)
+        self.assertEqual(self.route(), ("default", True))
+        self.assertEqual(self.route(token="Token second"), (REPLICA, False))
+
+    def test_failed_write_does_not_pin(self) -> None:
+        self.route("post", status=400)
+        self.assertEqual(self.route(), (REPLICA, False))
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_pin_expires(self) -> None:
+        self.route("post", status=201)
+        self.assertEqual(self.route(), (REPLICA, False))
+
+    def batch(self, token: str = "Token first") -> list[str]:
+        """БД для чтения в подзапросах пакета: с репликой и без нее."""
+        seen = []
+
+        @replica_read
+        def replica_view(request) -> HttpResponse:
+            seen.append(router.db_for_read(Recipe))
+            return HttpResponse()
+
+        def primary_view(request) -> HttpResponse:
+            seen.append(router.db_for_read(Recipe))
+            return HttpResponse()
+
+        views = {"/replica/": replica_view, "/primary/": primary_view}
+        batch_view = BatchView.as_view()
+
+        def get_response(request) -> HttpResponse:
+            middleware.process_view(request, batch_view, (), {})
+            batch_request = Request(request)
+            batch_request.user = AnonymousUser()
+            with mock.patch(
+                "api.batch.resolve",
+                lambda path: ResolverMatch(
+                    views[path], (), {}, namespaces=["api"]
+                ),
+            ):
+                for url in views:
+                    run_subrequest(batch_request, {"url": url})
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        middleware(
+            self.factory.post("/api/batch/", HTTP_AUTHORIZATION=token)
+        )
+        return seen
+
+    def test_batch_does_not_pin(self) -> None:
+        self.route("post", view=BatchView.as_view())
+        self.assertEqual(self.route(), (REPLICA, False))
+
+    def test_batch_subrequests_choose_replica(self) -> None:
+        self.assertEqual(self.batch(), [REPLICA, "default"])
+        self.assertEqual(self.route(), (REPLICA, False))
+
+    def test_pinned_batch_reads_primary(self) -> None:
+        self.route("post", status=201)
+        self.assertEqual(self.batch(), ["default", "default"])
+
+    @override_settings(DATABASE_REPLICAS=[DOWN])
+    def test_unavailable_replica_falls_back_to_primary(self) -> None:
+        self.assertEqual(self.route(), ("default", False))
+        self.assertIn(DOWN, _down_until)
+
+    @override_settings(DATABASE_REPLICAS=[DOWN, REPLICA])
+    def test_unavailable_replica_is_skipped(self) -> None:
+        for _ in range(5):
+            self.assertEqual(self.route(), (REPLICA, False))
@@ -0,0 +1,87 @@
+from core.features import update_recipe_ingredients
+from core.similar import compute_similar
+from django.test import TestCase
+
+from recipes.models import AmountIngredient, Ingredient, Recipe, SimilarRecipe
+from users.models import User
+
+
+def neighbours() -> dict[int, list[int]]:
+    result = {}
+    for recipe_id, similar_id in SimilarRecipe.objects.order_by(
+        "recipe_id", "-score", "similar_id"
+    ).values_list("recipe_id", "similar_id"):
+        result.setdefault(recipe_id, []).append(similar_id)
+    return result
+
+
+class IncrementalSimilarTests(TestCase):
+    """Пересчет без --full совпадает с полным пересчетом."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        author = User.objects.create(
+            username="similar", email="similar@example.com"
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f"ингредиент {idx}", measurement_unit="г"
+            )
+            for idx in range(6)
+        ]
+        cls.recipes = {}
+        for name, positions in (
+            ("a", (0, 1, 2)),
+            ("b", (0, 1, 2)),
+            ("c", (3, 4)),
+            ("d", (3, 4, 5)),
+        ):
+            recipe = Recipe.objects.create(
+                name=name, author=author, text="текст", cooking_time=10
+            )
+            for position in positions:
+                AmountIngredient.objects.create(
+                    recipe=recipe,
+                    ingredients=cls.ingredients[position],
+                    amount=1,
+                )
+            cls.recipes[name] = recipe
+
+    def compute(self, **options) -> int:
+        return compute_similar(max_df=1.0, **options)
+
+    def assertMatchesFull(self) -> None:
+        incremental = neighbours()
+        self.compute(full=True)
+        self.assertEqual(incremental, neighbours())
+
+    def test_incremental(self) -> None:
+        self.assertEqual(self.compute(), 4)
+        self.assertMatchesFull()
+        self.assertEqual(self.compute(), 0)
+
+        lonely = Recipe.objects.create(
+            name="e",
+            author=self.recipes["a"].author,
+            text="текст",
+            cooking_time=10,
+        )
+        self.assertEqual(self.compute(), 1)
+        self.assertNotIn(lonely.pk, neighbours())
+        # Рецепт без соседей рассчитан и больше не пересчитывается.
+        self.assertEqual(self.compute(), 0)
+
+        update_recipe_ingredients(
+            self.recipes["c"],
+            {item.pk: (item, 1) for item in self.ingredients[:3]},
+        )
+        self.compute()
+        self.assertIn(self.recipes["c"].pk, neighbours()[self.recipes["a"].pk])
+        self.assertNotIn(
+            self.recipes["c"].pk, neighbours().get(self.recipes["d"].pk, [])
+        )
+        self.assertMatchesFull()
+
+        self.recipes["b"].delete()
+        self.assertGreater(self.compute(), 0)
+        self.assertMatchesFull()
@@ -0,0 +1,91 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+
+def recipe_updates(queries) -> list[str]:
+    return [
+        query["sql"]
+        for query in queries
+        if query["sql"].startswith('UPDATE "recipes_recipe"')
+        and '"updated_at"' in query["sql"]
+    ]
+
+
+class UpdatedAtTests(TestCase):
+    """Дата изменения рецептов пишется только при реальных изменениях."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create(
+            username="author", email="author@example.com", first_name="Иван"
+        )
+        cls.tags = [
+            Tag.objects.create(
+                name=f"тег {idx}", color=f"#00000{idx}", slug=f"touch-{idx}"
+            )
+            for idx in range(2)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f"ингредиент {idx}", measurement_unit="г"
+            )
+            for idx in range(2)
+        ]
+        cls.recipe = Recipe.objects.create(
+            name="Суп", author=cls.user, text="текст", cooking_time=10
+        )
+
+    def setUp(self) -> None:
+        for alias in ("default", "responses"):
+            caches[alias].clear()
+
+    def test_profile_save_keeps_recipes(self) -> None:
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password("новый-пароль")
+        with CaptureQueriesContext(connection) as ctx:
+            user.save()
+            user.is_active = True
+            user.save(update_fields=["is_active"])
+        self.assertEqual(recipe_updates(ctx.captured_queries), [])
+
+    def test_author_change_touches_recipes(self) -> None:
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = "Петр"
+        with CaptureQueriesContext(connection) as ctx:
+            user.save()
+            user.save()
+        self.assertEqual(len(recipe_updates(ctx.captured_queries)), 1)
+
+    def test_unsaved_author_change_is_remembered(self) -> None:
+        user = User.objects.get(pk=self.user.pk)
+        user.last_name = "Сидоров"
+        user.save(update_fields=["is_active"])
+        with CaptureQueriesContext(connection) as ctx:
+            user.save()
+        self.assertEqual(len(recipe_updates(ctx.captured_queries)), 1)
+
+    def test_recipe_edit_writes_row_once(self) -> None:
+        client = APIClient()
+        client.force_authenticate(self.user)
+        payload = {
+            "tags": [tag.pk for tag in self.tags],
+            "ingredients": [
+                {"id": ingredient.pk, "amount": 5}
+                for ingredient in self.ingredients
+            ],
+            "name": "Борщ",
+            "text": "новый текст",
+            "cooking_time": 20,
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.patch(
+                f"/api/recipes/{self.recipe.pk}/", payload, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(recipe_updates(ctx.captured_queries)), 1)
@@ -1,7 +1,17 @@
-from django.urls import include, path
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from .views import (
+    BatchView,
+    IngredientViewSet,
+    MetricsView,
+    RecipeViewSet,
+    TagViewSet,
+    UserViewSet,
+    download_shopping_cart,
+    ingredients_list,
+    tags_list,
+)
 
 app_name = "api"
 
@@ -14,6 +24,15 @@ router.register("recipes", RecipeViewSet, "recipes")
 router.register("users", UserViewSet, "users")
 
 urlpatterns = (
+    re_path(r"^metrics/?$", MetricsView.as_view(), name="metrics"),
+    path("batch/", BatchView.as_view(), name="batch"),
+    path("tags/", tags_list, name="tags-list"),
+    path("ingredients/", ingredients_list, name="ingredients-list"),
+    path(
+        "recipes/download_shopping_cart/",
+        download_shopping_cart,
+        name="recipes-download-shopping-cart",
+    ),
     path("", include(router.urls)),
     path("", include("djoser.urls")),
     path("auth/", include("djoser.urls.authtoken")),
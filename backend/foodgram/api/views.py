@@ -1,19 +1,69 @@
-from core.features import create_shopping_list
+from collections.abc import Callable
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from core import metrics
+from core.cache import (
+    cache_shared_response,
+    cached_catalogue,
+    conditional_response,
+    recipe_etag,
+    recipes_etag,
+    recipes_version,
+)
+from core.features import (
+    create_shopping_list,
+    filter_by_tag_slugs,
+    filter_by_tags,
+    search_ingredients,
+)
+from core.feed import decode_cursor, encode_cursor, get_feed
+from core.pantry import index as pantry_index
+from core.routers import replica_read
+from core.search import search_recipes
+from core.trigrams import index_version
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.handlers.wsgi import WSGIRequest
 from django.db.models import Q, QuerySet
-from django.http import HttpResponse
+from django.http import HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework.decorators import action
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    MethodNotAllowed,
+    NotAuthenticated,
+    NotFound,
+    ValidationError,
+)
+from rest_framework.generics import get_object_or_404 as get_row_or_404
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.status import HTTP_400_BAD_REQUEST
+from rest_framework.status import (
+    HTTP_400_BAD_REQUEST,
+    HTTP_401_UNAUTHORIZED,
+    HTTP_405_METHOD_NOT_ALLOWED,
+)
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from .mixins import AddDeleteMixin
+from .authentication import CachedTokenAuthentication
+from .batch import run_subrequest
+from .mixins import AddDeleteMixin, SparseFieldsMixin
 from .pagination import PageLimitPagination
-from .permissions import AuthorStaffOrReadOnly
+from .permissions import AuthorStaffOrReadOnly, StaffOrInternalIP
+from .readers import (
+    RECIPE_RESPONSE_FIELDS,
+    build_recipes,
+    build_short_recipes,
+    read_recipes,
+    recipe_values,
+    short_recipe_values,
+)
+from .renderers import MessagePackRenderer, ORJSONRenderer, dumps
 from .serializers import (
     IngredientSerializer,
     RecipeSerializer,
@@ -21,18 +71,26 @@ from .serializers import (
     TagSerializer,
     UserSubscribeSerializer,
 )
-from recipes.models import Carts, Favorites, Ingredient, Recipe, Tag
+from recipes.models import (
+    Carts,
+    Favorites,
+    Ingredient,
+    Recipe,
+    SimilarRecipe,
+    Tag,
+)
 from users.models import Subscriptions
 
 User = get_user_model()
 
 
-class UserViewSet(DjoserUserViewSet, AddDeleteMixin):
+class UserViewSet(SparseFieldsMixin, DjoserUserViewSet, AddDeleteMixin):
     """Вьюсет для работы с пользователями."""
 
     add_serializer = UserSubscribeSerializer
     link_model = Subscriptions
     pagination_class = PageLimitPagination
+    replica_actions = ("list", "retrieve")
 
     @action(detail=True, permission_classes=(IsAuthenticated,))
     def subscribe(self, request: WSGIRequest, id: int | str) -> Response:
@@ -60,7 +118,9 @@ class UserViewSet(DjoserUserViewSet, AddDeleteMixin):
         pages = self.paginate_queryset(
             User.objects.filter(subscriptions__user=self.request.user)
         )
-        serializer = UserSubscribeSerializer(pages, many=True)
+        serializer = self.prune_fields(
+            UserSubscribeSerializer(pages, many=True)
+        )
         return self.get_paginated_response(serializer.data)
 
 
@@ -71,6 +131,7 @@ class TagViewSet(ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
+    replica_actions = ("list", "retrieve")
 
 
 class IngredientViewSet(ReadOnlyModelViewSet):
@@ -80,23 +141,17 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
+    replica_actions = ("list", "retrieve")
 
-    def get_queryset(self) -> list[Ingredient]:
+    def get_queryset(self) -> QuerySet[Ingredient] | list[dict]:
         """Получает queryset."""
         name: str = self.request.query_params.get("name")
-        query = self.queryset
         if not name:
-            return query
-
-        starts_queryset = query.filter(name__istartswith=name)
-        starts_names = (ing.name for ing in starts_queryset)
-        contain_queryset = query.filter(name__icontains=name).exclude(
-            name__in=starts_names
-        )
-        return list(starts_queryset) + list(contain_queryset)
+            return self.queryset
+        return search_ingredients(name)
 
 
-class RecipeViewSet(ModelViewSet, AddDeleteMixin):
+class RecipeViewSet(SparseFieldsMixin, ModelViewSet, AddDeleteMixin):
     """Вьюсет для Recipe."""
 
     queryset = Recipe.objects.select_related("author")
@@ -104,16 +159,27 @@ class RecipeViewSet(ModelViewSet, AddDeleteMixin):
     permission_classes = (AuthorStaffOrReadOnly,)
     add_serializer = ShortRecipeSerializer
     pagination_class = PageLimitPagination
+    replica_actions = ("list", "retrieve")
 
     def get_queryset(self) -> QuerySet[Recipe]:
         """Получает queryset."""
+        return self._filter_recipes(filter_by_tags)
+
+    def _filter_recipes(self, tags_filter) -> QuerySet[Recipe]:
         query = self.queryset
         tags: list = self.request.query_params.getlist("tags")
         if tags:
-            query = query.filter(tags__slug__in=tags).distinct()
+            query = tags_filter(
+                query,
+                tags,
+                self.request.query_params.get("tags_all") in ("1", "true"),
+            )
         author: str = self.request.query_params.get("author")
         if author:
             query = query.filter(author=author)
+        search: str = self.request.query_params.get("search")
+        if search:
+            query = search_recipes(query, search)
 
         if self.request.user.is_anonymous:
             return query
@@ -132,6 +198,124 @@ class RecipeViewSet(ModelViewSet, AddDeleteMixin):
             query = query.exclude(favorites__user=self.request.user)
         return query
 
+    def get_etag(self, request, *args, **kwargs) -> str | None:
+        """ETag ответа list или retrieve без его сборки."""
+        if self.action == "retrieve":
+            return recipe_etag(
+                request, kwargs[self.lookup_url_kwarg or self.lookup_field]
+            )
+        page = self._page_slice(request)
+        if page is None:
+            return None
+        return recipes_etag(
+            request,
+            self.filter_queryset(self._filter_recipes(filter_by_tag_slugs)),
+            page,
+        )
+
+    def _page_slice(self, request) -> slice | None:
+        """Срез выборки для запрошенной страницы; None для неверного номера."""
+        size = self.paginator.get_page_size(request)
+        if size is None:
+            return slice(None)
+        try:
+            number = int(
+                request.query_params.get(self.paginator.page_query_param, 1)
+            )
+        except ValueError:
+            return None
+        if number < 1:
+            return None
+        return slice((number - 1) * size, number * size)
+
+    @conditional_response
+    @cache_shared_response
+    def list(self, request, *args, **kwargs) -> Response:
+        """Список рецептов без полей сериализатора."""
+        fields = self.get_response_fields(RECIPE_RESPONSE_FIELDS)
+        queryset = recipe_values(
+            self.filter_queryset(self.get_queryset()), fields
+        )
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(build_recipes(list(queryset), request, fields))
+        return self.get_paginated_response(
+            build_recipes(page, request, fields)
+        )
+
+    @conditional_response
+    @cache_shared_response
+    def retrieve(self, request, *args, **kwargs) -> Response:
+        """Рецепт без полей сериализатора."""
+        fields = self.get_response_fields(RECIPE_RESPONSE_FIELDS)
+        row = get_row_or_404(
+            recipe_values(self.filter_queryset(self.get_queryset()), fields),
+            pk=kwargs[self.lookup_url_kwarg or self.lookup_field],
+        )
+        return Response(build_recipes([row], request, fields)[0])
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def feed(self, request) -> Response:
+        """Лента рецептов авторов из подписок."""
+        cursor = request.query_params.get("cursor")
+        try:
+            cursor = cursor and decode_cursor(cursor)
+        except ValueError:
+            raise NotFound("Неверный курсор.")
+        limit = self.paginator.get_page_size(request)
+        recipe_ids, next_key = get_feed(request.user, limit, cursor or None)
+        next_url = next_key and replace_query_param(
+            request.build_absolute_uri(), "cursor", encode_cursor(next_key)
+        )
+        results = read_recipes(
+            recipe_ids,
+            request,
+            self.get_response_fields(RECIPE_RESPONSE_FIELDS),
+        )
+        return Response({"next": next_url, "results": results})
+
+    @action(detail=False)
+    def pantry(self, request) -> Response:
+        """Рецепты, которые можно приготовить из имеющихся ингредиентов."""
+        try:
+            ingredients = set(
+                map(int, request.query_params.getlist("ingredients"))
+            )
+            missing = request.query_params.get("missing")
+            missing = None if missing in (None, "") else int(missing)
+        except ValueError:
+            raise ValidationError(
+                "ingredients и missing должны быть целыми числами."
+            )
+        ranked = self.paginate_queryset(
+            pantry_index.search(ingredients, missing)
+        )
+        counts = {
+            recipe_id: (matched, lacking)
+            for recipe_id, matched, lacking in ranked
+        }
+        results = read_recipes(
+            list(counts),
+            request,
+            self.get_response_fields(RECIPE_RESPONSE_FIELDS),
+        )
+        for data in results:
+            data["matched"], data["missing"] = counts[data["id"]]
+        return self.get_paginated_response(results)
+
+    @action(detail=True)
+    def similar(self, request, pk: int | str) -> Response:
+        """Похожие рецепты по общим ингредиентам и тегам."""
+        neighbours = short_recipe_values(
+            SimilarRecipe.objects.filter(recipe_id=pk).order_by("-score"),
+            prefix="similar__",
+        )
+        if not neighbours:
+            get_object_or_404(Recipe, id=pk)
+        return Response(
+            build_short_recipes(neighbours, request, prefix="similar__")
+        )
+
     @action(detail=True, permission_classes=(IsAuthenticated,))
     def favorite(self, request: WSGIRequest, pk: int | str) -> Response:
         """Добавляет или удаляет рецеп из Favorites."""
@@ -172,14 +356,187 @@ class RecipeViewSet(ModelViewSet, AddDeleteMixin):
             return Response(status=HTTP_400_BAD_REQUEST)
         return self._delete_relation(Q(recipe__id=pk))
 
-    @action(methods=("get",), detail=False)
-    def download_shopping_cart(self, request) -> Response | HttpResponse:
-        """Скачивает файл Carts."""
-        user = self.request.user
-        filename = f"{user.username}_shopping_list.txt"
-        shopping_list = create_shopping_list(user)
-        response = HttpResponse(
-            shopping_list, content_type="text.txt; charset=utf-8"
+
+class MetricsView(APIView):
+    """Метрики приложения в формате Prometheus."""
+
+    permission_classes = (StaffOrInternalIP,)
+
+    def get(self, request) -> HttpResponse:
+        return HttpResponse(
+            metrics.registry.render(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+
+class BatchView(APIView):
+    """Несколько GET-запросов к API за один HTTP-запрос.
+
+    Тело: {"requests": [{"url": "/api/users/me/"}, ...]}, ответ — статусы
+    и данные подзапросов в том же порядке.
+    """
+
+    permission_classes = (AllowAny,)
+    # Пакет только читает: не закрепляет клиента за основной БД.
+    read_only = True
+
+    def post(self, request) -> Response:
+        items = None
+        if isinstance(request.data, dict):
+            items = request.data.get("requests")
+        if not isinstance(items, list) or not items:
+            raise ValidationError("requests должен быть непустым списком.")
+        if len(items) > settings.BATCH_MAX_REQUESTS:
+            raise ValidationError(
+                f"Не больше {settings.BATCH_MAX_REQUESTS} запросов в пакете."
+            )
+        return Response(
+            {"responses": [run_subrequest(request, item) for item in items]}
         )
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return response
+
+
+@sync_to_async
+def _authenticate(request: HttpRequest) -> User | None:
+    """Аутентификация по токену для асинхронных вью.
+
+    Неверный токен поднимает AuthenticationFailed, как во вьюсетах.
+    """
+    credentials = CachedTokenAuthentication().authenticate(request)
+    return credentials and credentials[0]
+
+
+def _unauthorized(exc: APIException) -> HttpResponse:
+    response = _json_response(
+        {"detail": str(exc.detail)}, status=HTTP_401_UNAUTHORIZED
+    )
+    response["WWW-Authenticate"] = CachedTokenAuthentication.keyword
+    return response
+
+
+def _json_response(
+    data: list | dict, reuse_compressed: bool = False, **kwargs
+) -> HttpResponse:
+    response = HttpResponse(
+        dumps(data), content_type="application/json", **kwargs
+    )
+    # Справочники меняются редко: CompressionMiddleware сожмет их один раз.
+    response.reuse_compressed = reuse_compressed
+    return response
+
+
+def _catalogue(
+    request: HttpRequest,
+    viewset: type[ReadOnlyModelViewSet],
+    load: Callable[[], list[dict]],
+    reuse_compressed: bool = False,
+) -> HttpResponse:
+    """Справочник с проверками list вьюсета DRF, но без сериализаторов.
+
+    Права, троттлинг и выбор формата проходят как во вьюсете, ошибки и
+    HTML браузерного API отдает он же. JSON и MessagePack собираются из
+    кеша справочника.
+    """
+    view = viewset(
+        action_map={"get": "list", "head": "list"}, args=(), kwargs={}
+    )
+    drf_request = view.initialize_request(request)
+    view.request = drf_request
+    view.headers = view.default_response_headers
+    try:
+        view.initial(drf_request)
+        renderer = drf_request.accepted_renderer
+        if not isinstance(renderer, (ORJSONRenderer, MessagePackRenderer)):
+            response = view.list(drf_request)
+        elif isinstance(renderer, MessagePackRenderer):
+            response = HttpResponse(
+                renderer.render(load()), content_type=renderer.media_type
+            )
+            response.reuse_compressed = reuse_compressed
+        else:
+            response = _json_response(load(), reuse_compressed)
+    except Exception as exc:
+        response = view.handle_exception(exc)
+    response = view.finalize_response(drf_request, response)
+    if isinstance(response, Response):
+        response.render()
+    return response
+
+
+def require_safe(view):
+    """Пропускает к асинхронному вью только GET и HEAD.
+
+    require_safe из Django 3.2 не умеет оборачивать корутины.
+    """
+
+    @wraps(view)
+    async def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        if request.method not in ("GET", "HEAD"):
+            response = _json_response(
+                {"detail": str(MethodNotAllowed(request.method).detail)},
+                status=HTTP_405_METHOD_NOT_ALLOWED,
+            )
+            response["Allow"] = "GET, HEAD"
+            return response
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _tags() -> list[dict]:
+    # Теги меняют версию рецептов, поэтому список привязан к ней.
+    return cached_catalogue(
+        "tags",
+        lambda: list(Tag.objects.values("id", "name", "color", "slug")),
+        recipes_version(),
+    )
+
+
+def _ingredients(name: str | None) -> list[dict]:
+    # Поиск по name идет по индексу в памяти процесса без запросов к БД;
+    # в общий кеш попадает только полный справочник.
+    if name:
+        return search_ingredients(name)
+    return cached_catalogue(
+        "ingredients", lambda: search_ingredients(None), index_version()
+    )
+
+
+@replica_read
+@require_safe
+async def tags_list(request: HttpRequest) -> HttpResponse:
+    """Асинхронный список тегов."""
+    return await sync_to_async(_catalogue)(
+        request, TagViewSet, _tags, reuse_compressed=True
+    )
+
+
+@replica_read
+@require_safe
+async def ingredients_list(request: HttpRequest) -> HttpResponse:
+    """Асинхронный поиск ингредиентов."""
+    name = request.GET.get("name")
+    return await sync_to_async(_catalogue)(
+        request,
+        IngredientViewSet,
+        lambda: _ingredients(name),
+        reuse_compressed=not name,
+    )
+
+
+@require_safe
+async def download_shopping_cart(request: HttpRequest) -> HttpResponse:
+    """Скачивает файл Carts, не занимая воркер на медленных клиентах."""
+    try:
+        user = await _authenticate(request)
+    except AuthenticationFailed as exc:
+        return _unauthorized(exc)
+    if user is None:
+        return _unauthorized(NotAuthenticated())
+    filename = f"{user.username}_shopping_list.txt"
+    with metrics.timer("shopping_list_duration_seconds"):
+        shopping_list = await sync_to_async(create_shopping_list)(user)
+    response = HttpResponse(
+        shopping_list, content_type="text.txt; charset=utf-8"
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,91 @@
+"""Инструменты админки для больших таблиц."""
+from django.contrib.admin import FieldListFilter, ModelAdmin
+from django.contrib.admin.views.main import PAGE_VAR
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.forms import ModelChoiceField
+from django.utils.functional import cached_property
+
+ESTIMATE_THRESHOLD = 10_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Берет количество строк из статистики PostgreSQL.
+
+    Оценка используется только для списка без фильтров и только для больших
+    таблиц, иначе выполняется обычный COUNT(*).
+    """
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == "postgresql" and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE relname = %s",
+                    (queryset.model._meta.db_table,),
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= ESTIMATE_THRESHOLD:
+                return int(row[0])
+        return super().count
+
+
+class AutocompleteFilter(FieldListFilter):
+    """Фильтр по внешнему ключу с автодополнением.
+
+    В отличие от стандартного фильтра не выбирает все значения поля, а
+    ищет их через autocomplete админки связанной модели.
+    """
+
+    template = "admin/autocomplete_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f"{field_path}__{field.target_field.name}__exact"
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(
+            field, request, params, model, model_admin, field_path
+        )
+        self.form_field = ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False,
+        )
+
+    def expected_parameters(self) -> list[str]:
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        yield {
+            "selected": self.lookup_val is not None,
+            "widget": self.form_field.widget.render(
+                self.lookup_kwarg, self.lookup_val
+            ),
+            "params": {
+                key: value
+                for key, value in changelist.params.items()
+                if key not in (self.lookup_kwarg, PAGE_VAR)
+            },
+            "clear_url": changelist.get_query_string(
+                remove=[self.lookup_kwarg]
+            ),
+        }
+
+
+class LargeTableAdmin(ModelAdmin):
+    """Настройки списка для таблиц с большим количеством строк."""
+
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    @property
+    def media(self):
+        media = super().media
+        if any(
+            isinstance(item, tuple) and issubclass(item[1], AutocompleteFilter)
+            for item in self.list_filter
+        ):
+            media += AutocompleteSelect(None, self.admin_site).media
+        return media
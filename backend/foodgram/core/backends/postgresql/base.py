@@ -0,0 +1,162 @@
+"""PostgreSQL с проверкой переиспользуемых соединений и пулом.
+
+Дополнительные ключи ``DATABASES``:
+
+* ``CONN_HEALTH_CHECKS`` - перед первым запросом к БД в рамках HTTP-запроса
+  переиспользуемое соединение проверяется ``SELECT 1``;
+* ``POOL_SIZE`` - размер пула соединений процесса (0 - пул выключен);
+* ``POOL_TIMEOUT`` - сколько секунд ждать свободное соединение из пула.
+
+Пул нужен потоковым и асинхронным воркерам: соединения Django живут в
+потоках, а пул переживает их и раздает соединения любому потоку. У каждой
+базы свой пул, поэтому после переключения NAME (тестовая БД) соединения
+старой базы не переиспользуются.
+"""
+import threading
+
+import psycopg2
+import psycopg2.extras
+from django.db.backends.postgresql import base, creation
+from django.utils.asyncio import async_unsafe
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _is_alive(connection) -> bool:
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений psycopg2."""
+
+    def __init__(self, size: int, timeout: float, health_checks: bool):
+        self.timeout = timeout
+        self.health_checks = health_checks
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def get(self, conn_params: dict):
+        """Выдает свободное соединение или открывает новое."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise psycopg2.OperationalError("connection pool exhausted")
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    return psycopg2.connect(**conn_params)
+                if not connection.closed and (
+                    not self.health_checks or _is_alive(connection)
+                ):
+                    return connection
+                connection.close()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def put(self, connection) -> None:
+        """Возвращает соединение в пул, откатив незавершенную транзакцию."""
+        try:
+            if connection.closed:
+                return
+            try:
+                status = connection.info.transaction_status
+                if status != TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            except psycopg2.Error:
+                connection.close()
+                return
+            with self._lock:
+                self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """Закрывает свободные соединения."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+def close_pool(alias: str, name: str) -> None:
+    """Закрывает и забывает пул базы name, например перед ее удалением."""
+    with _pools_lock:
+        pool = _pools.pop((alias, name), None)
+    if pool is not None:
+        pool.close()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name: str, verbosity) -> None:
+        # Свободные соединения пула иначе не дадут удалить базу.
+        close_pool(self.connection.alias, test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    health_check_pending = False
+    # Пул, из которого взято текущее соединение.
+    pool = None
+
+    def _get_pool(self) -> ConnectionPool | None:
+        size = self.settings_dict.get("POOL_SIZE", 0)
+        if not size:
+            return None
+        key = (self.alias, self.settings_dict["NAME"])
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(
+                    size,
+                    self.settings_dict.get("POOL_TIMEOUT", 10),
+                    self.settings_dict.get("CONN_HEALTH_CHECKS", False),
+                )
+        return pool
+
+    def get_new_connection(self, conn_params: dict):
+        self.pool = self._get_pool()
+        if self.pool is None:
+            return super().get_new_connection(conn_params)
+        connection = self.pool.get(conn_params)
+        # Та же настройка, что делает родительский метод после connect().
+        self.isolation_level = self.settings_dict["OPTIONS"].get(
+            "isolation_level", connection.isolation_level
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            self.pool.put(self.connection)
+
+    def close_if_unusable_or_obsolete(self) -> None:
+        super().close_if_unusable_or_obsolete()
+        if (
+            self.connection is not None
+            and self.settings_dict.get("CONN_HEALTH_CHECKS", False)
+        ):
+            self.health_check_pending = True
+
+    @async_unsafe
+    def ensure_connection(self) -> None:
+        if self.health_check_pending:
+            self.health_check_pending = False
+            if self.connection is not None and not self.is_usable():
+                self.close()
+        super().ensure_connection()
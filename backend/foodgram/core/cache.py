@@ -0,0 +1,389 @@
+"""Общий кеш ответов с рецептами.
+
+Списки и карточки рецептов у всех пользователей отличаются только флагами
+is_favorited, is_in_shopping_cart и author.is_subscribed. Поэтому готовые
+данные ответа хранятся без личных флагов по ключу из адреса запроса с
+упорядоченными параметрами и общей версии рецептов. Сигналы меняют версию
+после коммита, и все сохраненные ответы разом устаревают, а вытеснением
+занимается сам бэкенд кеша. Вошедшим пользователям флаги проставляются из
+закешированных множеств id их избранного, списка покупок и подписок.
+
+ETag ответа считается до его сборки: для рецепта — по дате изменения и
+флагам пользователя, для списка — по рецептам страницы, их датам изменения,
+числу рецептов в выборке и флагам только рецептов страницы. Совпавший
+If-None-Match стоит одного запроса к БД.
+
+Промахи ответов и справочников пересчитывает single_flight: значение
+вычисляет один запрос под блокировкой в кеше locks, который хранится в
+основной БД и общий для всех воркеров и хостов, а остальные ждут его или
+отдают устаревшее значение. Незадолго до истечения значение с вероятностью
+по алгоритму XFetch обновляется заранее, чтобы промахи не совпадали.
+"""
+import math
+import random
+import time
+from functools import wraps
+from hashlib import sha256
+from typing import Any, Callable
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from core import metrics
+from django.conf import settings
+from django.core.cache import BaseCache, cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+from django.db.models import Count, QuerySet, Window
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
+
+from recipes.models import Carts, Favorites, Recipe
+from users.models import Subscriptions
+
+VERSION_KEY = "recipes:version"
+LOCK_POLL_SECONDS = 0.05
+# Множества флагов: модель связи и поле с id отмеченного объекта.
+FLAG_SETS = {
+    "favorites": (Favorites, "recipe_id"),
+    "carts": (Carts, "recipe_id"),
+    "subscriptions": (Subscriptions, "author_id"),
+}
+NO_FLAGS = dict.fromkeys(FLAG_SETS, frozenset())
+# С этими параметрами сама выборка зависит от пользователя.
+PERSONAL_PARAMS = ("is_favorited", "is_in_shopping_cart")
+
+
+def recipes_version() -> str:
+    """Текущая версия рецептов, общая для всех процессов."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_recipes_version() -> None:
+    """Сбрасывает кеш ответов после коммита текущей транзакции."""
+    transaction.on_commit(
+        lambda: cache.set(VERSION_KEY, uuid4().hex, None)
+    )
+
+
+def _acquire(lock_key: str, lock_cache: BaseCache) -> str | None:
+    token = uuid4().hex
+    if lock_cache.add(lock_key, token, settings.CACHE_LOCK_TIMEOUT):
+        return token
+    return None
+
+
+def _release(lock_key: str, token: str, lock_cache: BaseCache) -> None:
+    if lock_cache.get(lock_key) == token:
+        lock_cache.delete(lock_key)
+
+
+def _is_fresh(entry: tuple, version: Any) -> bool:
+    """Свежесть значения с ранним обновлением по XFetch."""
+    _, entry_version, expires_at, delta = entry
+    if entry_version != version:
+        return False
+    early = -delta * settings.CACHE_XFETCH_BETA * math.log(
+        1 - random.random()
+    )
+    return time.time() + early < expires_at
+
+
+def _store(
+    using: BaseCache,
+    key: str,
+    value: Any,
+    version: Any,
+    delta: float,
+    timeout: int | None,
+) -> None:
+    """Сохраняет значение со сроком свежести и запасом на устаревание."""
+    if timeout is DEFAULT_TIMEOUT:
+        timeout = using.default_timeout
+    if timeout is None:
+        using.set(key, (value, version, math.inf, delta), None)
+        return
+    using.set(
+        key,
+        (value, version, time.time() + timeout, delta),
+        timeout + settings.CACHE_STALE_SECONDS,
+    )
+
+
+def single_flight(
+    name: str,
+    key: str,
+    compute: Callable[[], Any],
+    timeout: int | None = DEFAULT_TIMEOUT,
+    version: Any = None,
+    using: BaseCache = cache,
+    lock_cache: BaseCache | None = None,
+) -> Any:
+    """Значение из кеша using, которое вычисляет только один запрос.
+
+    Значение устаревает через timeout секунд или при смене version. Пока
+    один запрос пересчитывает его под блокировкой в lock_cache (по
+    умолчанию LOCK_CACHE_ALIAS), остальные отдают устаревшее значение, а
+    если его нет — ждут результат до CACHE_LOCK_WAIT секунд. Если compute
+    вернул None или упал, старое значение удаляется, чтобы его не отдавали
+    другим запросам.
+    """
+    entry = using.get(key)
+    if entry is not None and _is_fresh(entry, version):
+        metrics.cache_lookup(name, True)
+        return entry[0]
+    if lock_cache is None:
+        lock_cache = caches[settings.LOCK_CACHE_ALIAS]
+    lock_key = f"lock:{key}"
+    token = _acquire(lock_key, lock_cache)
+    if token is None:
+        if entry is not None:
+            metrics.inc("app_cache_requests_total", cache=name, result="stale")
+            return entry[0]
+        deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_SECONDS)
+            entry = using.get(key)
+            if entry is not None and entry[1] == version:
+                metrics.cache_lookup(name, True)
+                return entry[0]
+            if lock_cache.get(lock_key) is None:
+                break
+    metrics.cache_lookup(name, False)
+    try:
+        started = time.monotonic()
+        value = compute()
+    except Exception:
+        using.delete(key)
+        raise
+    else:
+        if value is None:
+            using.delete(key)
+        else:
+            delta = time.monotonic() - started
+            _store(using, key, value, version, delta, timeout)
+    finally:
+        if token is not None:
+            _release(lock_key, token, lock_cache)
+    return value
+
+
+def cached_catalogue(
+    key: str, compute: Callable[[], list[dict]], version: Any
+) -> list[dict]:
+    """Справочник из общего кеша ответов, который пересчитывает один запрос."""
+    return single_flight(
+        "catalogue",
+        f"catalogue:{sha256(key.encode()).hexdigest()}",
+        compute,
+        version=version,
+        using=caches[settings.RESPONSE_CACHE_ALIAS],
+    )
+
+
+def user_flags_version_key(user_id: int, name: str) -> str:
+    return f"user:{user_id}:{name}:version"
+
+
+def user_flags_versions(user_id: int) -> dict[str, str]:
+    """Текущие версии множеств флагов пользователя."""
+    keys = {name: user_flags_version_key(user_id, name) for name in FLAG_SETS}
+    cached = cache.get_many(keys.values())
+    versions = {}
+    for name, key in keys.items():
+        version = cached.get(key)
+        if version is None:
+            cache.add(key, uuid4().hex, None)
+            version = cache.get(key)
+        versions[name] = version
+    return versions
+
+
+def user_flags(user_id: int) -> dict[str, set[int]]:
+    """Множества id избранного, списка покупок и подписок пользователя.
+
+    Множества лежат в общем кеше default (см. api.E001) под ключом с
+    версией, которую меняет каждая запись. Версия читается до сборки
+    множества, поэтому множество, собранное до чужого коммита, попадает
+    под старый ключ и больше не читается. Собираются множества всегда с
+    основной БД: реплика может отставать.
+    """
+    keys = {
+        name: f"user:{user_id}:{name}:{version}"
+        for name, version in user_flags_versions(user_id).items()
+    }
+    cached = cache.get_many(keys.values())
+    metrics.cache_lookup("user_flags", len(cached) == len(keys))
+    flags, missing = {}, {}
+    for name, key in keys.items():
+        if key in cached:
+            flags[name] = cached[key]
+            continue
+        model, field = FLAG_SETS[name]
+        flags[name] = missing[key] = set(
+            model.objects.using("default")
+            .filter(user_id=user_id)
+            .values_list(field, flat=True)
+        )
+    if missing:
+        cache.set_many(missing, settings.USER_FLAGS_TTL)
+    return flags
+
+
+def forget_user_flags(user_id: int, name: str) -> None:
+    """Меняет версию множества флагов пользователя после коммита."""
+    transaction.on_commit(
+        lambda: cache.set(
+            user_flags_version_key(user_id, name), uuid4().hex, None
+        )
+    )
+
+
+def overlay_flags(data: dict | list, flags: dict[str, set[int]]) -> None:
+    """Проставляет личные флаги в данные ответа с рецептами."""
+    if isinstance(data, list):
+        recipes = data
+    else:
+        recipes = data["results"] if "results" in data else [data]
+    for recipe in recipes:
+        if "is_favorited" in recipe:
+            recipe["is_favorited"] = recipe["id"] in flags["favorites"]
+        if "is_in_shopping_cart" in recipe:
+            recipe["is_in_shopping_cart"] = recipe["id"] in flags["carts"]
+        author = recipe.get("author")
+        if author:
+            author["is_subscribed"] = author["id"] in flags["subscriptions"]
+
+
+def response_cache_key(request) -> str:
+    """Ключ ответа: адрес и отсортированные параметры запроса."""
+    params = urlencode(
+        sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+        )
+    )
+    url = f"{request.build_absolute_uri(request.path)}?{params}"
+    digest = sha256(url.encode()).hexdigest()
+    return f"response:{digest}"
+
+
+def cache_shared_response(method: Callable) -> Callable:
+    """Отдает общие данные ответа метода вьюсета с личными флагами."""
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs) -> Response:
+        user = request.user
+        if (
+            request.method not in SAFE_METHODS
+            or getattr(request, "pinned_to_primary", False)
+            or user.is_authenticated
+            and any(param in request.query_params for param in PERSONAL_PARAMS)
+        ):
+            return method(self, request, *args, **kwargs)
+        response = None
+
+        def compute() -> dict | list | None:
+            nonlocal response
+            response = method(self, request, *args, **kwargs)
+            if response.status_code != HTTP_200_OK:
+                return None
+            overlay_flags(response.data, NO_FLAGS)
+            return response.data
+
+        data = single_flight(
+            "shared_responses",
+            response_cache_key(request),
+            compute,
+            version=recipes_version(),
+            using=caches[settings.RESPONSE_CACHE_ALIAS],
+        )
+        if data is None:
+            return response
+        if user.is_authenticated:
+            overlay_flags(data, user_flags(user.pk))
+        return Response(data)
+
+    return wrapper
+
+
+def _etag(request, *state) -> str:
+    key = (response_cache_key(request), request.accepted_renderer.format)
+    return quote_etag(sha256(repr(key + state).encode()).hexdigest()[:32])
+
+
+def recipe_etag(request, pk: int | str) -> str | None:
+    """ETag карточки рецепта или None, если рецепта нет."""
+    try:
+        row = (
+            Recipe.objects.filter(pk=pk)
+            .values_list("pk", "author_id", "updated_at")
+            .first()
+        )
+    except ValueError:
+        return None
+    if row is None:
+        return None
+    recipe_id, author_id, updated_at = row
+    flags = ()
+    if request.user.is_authenticated:
+        sets = user_flags(request.user.pk)
+        flags = (
+            recipe_id in sets["favorites"],
+            recipe_id in sets["carts"],
+            author_id in sets["subscriptions"],
+        )
+    return _etag(request, recipe_id, updated_at, flags)
+
+
+def recipes_etag(request, queryset: QuerySet[Recipe], page: slice) -> str:
+    """ETag страницы page списка рецептов.
+
+    Рецепты страницы и размер выборки читаются одним запросом: число
+    строк считает оконный COUNT до LIMIT.
+    """
+    rows = tuple(
+        queryset.annotate(total=Window(Count("pk"))).values_list(
+            "pk", "author_id", "updated_at", "total"
+        )[page]
+    )
+    flags = ()
+    if rows and request.user.is_authenticated:
+        sets = user_flags(request.user.pk)
+        flags = tuple(
+            (
+                recipe_id in sets["favorites"],
+                recipe_id in sets["carts"],
+                author_id in sets["subscriptions"],
+            )
+            for recipe_id, author_id, *_ in rows
+        )
+    return _etag(request, rows, flags)
+
+
+def conditional_response(method: Callable) -> Callable:
+    """Отвечает 304 по If-None-Match, не вызывая метод вьюсета.
+
+    ETag считает метод вьюсета get_etag(request, *args, **kwargs).
+    """
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs) -> Response:
+        etag = self.get_etag(request, *args, **kwargs)
+        if etag is None:
+            return method(self, request, *args, **kwargs)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = method(self, request, *args, **kwargs)
+        if response.status_code in (HTTP_200_OK, HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+        return response
+
+    return wrapper
@@ -0,0 +1,109 @@
+"""Сжатие ответов API.
+
+Кодировка выбирается по Accept-Encoding: brotli, если установлен пакет
+brotli и клиент его принимает, иначе gzip. Потоковые ответы сжимаются по
+частям, каждая часть сразу уходит клиенту. Неизменные ответы вроде
+справочника ингредиентов помечаются reuse_compressed: процесс сжимает такое
+тело один раз и дальше отдает готовый результат.
+"""
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+from hashlib import sha256
+from typing import Iterable, Iterator
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Сколько сжатых неизменных ответов процесс держит в памяти.
+REUSED_MAX_ENTRIES = 32
+
+_reused: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+_reused_lock = threading.Lock()
+
+
+def available_encodings() -> tuple[str, ...]:
+    """Поддерживаемые кодировки в порядке предпочтения."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def _quality(params: str) -> float:
+    for param in params.split(";"):
+        name, _, value = param.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """Кодировка с наибольшим q из заголовка Accept-Encoding."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if name:
+            accepted[name] = _quality(params)
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(
+            data, quality=settings.COMPRESSION_BROTLI_QUALITY
+        )
+    return gzip.compress(
+        data, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0
+    )
+
+
+def compress_reused(data: bytes, encoding: str) -> bytes:
+    """Сжимает неизменное тело один раз на процесс."""
+    key = (sha256(data).hexdigest(), encoding)
+    with _reused_lock:
+        compressed = _reused.get(key)
+        if compressed is not None:
+            _reused.move_to_end(key)
+            return compressed
+    compressed = compress(data, encoding)
+    with _reused_lock:
+        _reused[key] = compressed
+        while len(_reused) > REUSED_MAX_ENTRIES:
+            _reused.popitem(last=False)
+    return compressed
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Сжимает поток по частям, сбрасывая буфер после каждой части."""
+    if encoding == "br":
+        compressor = brotli.Compressor(
+            quality=settings.COMPRESSION_BROTLI_QUALITY
+        )
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(
+        settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+    )
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+        if data:
+            yield data
+    yield compressor.flush()
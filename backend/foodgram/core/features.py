@@ -1,9 +1,48 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 
-from django.db.models import F, Sum
+from core.cache import bump_recipes_version
+from core.pantry import schedule_change
+from core.trigrams import ingredient_index
+from django.db.models import (
+    Count,
+    F,
+    Func,
+    Model,
+    OuterRef,
+    QuerySet,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 
-from recipes.models import AmountIngredient, Ingredient, Recipe
-from users.models import User
+from recipes.models import (
+    AmountIngredient,
+    Carts,
+    Favorites,
+    Ingredient,
+    Recipe,
+    Tag,
+    tag_bit,
+)
+from users.models import Subscriptions, User
+
+# Пока update_recipe_ingredients меняет строки пачкой, сигналы строк
+# AmountIngredient пропускаются: рецепт обновляется один раз в конце.
+_bulk_update: ContextVar[bool] = ContextVar("bulk_update", default=False)
+# Рецепты, строку которых сохранят в конце правки: save() сам обновит
+# updated_at, и touch_recipes для них лишний.
+_saving: ContextVar[frozenset[int]] = ContextVar("saving", default=frozenset())
+
+COUNTERS = (
+    (Recipe, "favorites_count", Favorites, "recipe"),
+    (Recipe, "carts_count", Carts, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "followers_count", Subscriptions, "author"),
+)
 
 
 def create_recipe_ingredients(
@@ -20,15 +59,163 @@ def create_recipe_ingredients(
             )
         )
     AmountIngredient.objects.bulk_create(objs)
+    schedule_change(recipe.pk)
 
 
-def create_shopping_list(user: User) -> str:
-    """Создает список покупок."""
-    shopping_list = [
-        f"Список покупок для:\n\n{user.first_name}\n"
-        f'{datetime.now().strftime("%d/%m/%Y %H:%M")}\n'
-    ]
-    ingredients = (
+def update_recipe_ingredients(
+    recipe: Recipe, ingredients: dict[int, tuple["Ingredient", int]]
+) -> None:
+    """Приводит игредиенты рецепта к новому списку минимумом запросов."""
+    current = {
+        amount_ingredient.ingredients_id: amount_ingredient
+        for amount_ingredient in AmountIngredient.objects.filter(recipe=recipe)
+    }
+    to_create = []
+    to_update = []
+    for ingredient, amount in ingredients.values():
+        amount_ingredient = current.pop(ingredient.pk, None)
+        if amount_ingredient is None:
+            to_create.append(
+                AmountIngredient(
+                    recipe=recipe,
+                    amount=amount,
+                    ingredients=ingredient,
+                )
+            )
+        elif amount_ingredient.amount != amount:
+            amount_ingredient.amount = amount
+            to_update.append(amount_ingredient)
+
+    if current:
+        token = _bulk_update.set(True)
+        try:
+            AmountIngredient.objects.filter(
+                pk__in=[obj.pk for obj in current.values()]
+            ).delete()
+        finally:
+            _bulk_update.reset(token)
+    if to_update:
+        AmountIngredient.objects.bulk_update(to_update, ("amount",))
+    if to_create:
+        AmountIngredient.objects.bulk_create(to_create)
+    if current or to_update or to_create:
+        schedule_change(recipe.pk)
+        mark_similar_stale(recipe.pk)
+        if not will_save(recipe.pk):
+            touch_recipes(pk=recipe.pk)
+        bump_recipes_version()
+
+
+def in_bulk_update() -> bool:
+    """Меняет ли строки ингредиентов update_recipe_ingredients."""
+    return _bulk_update.get()
+
+
+@contextmanager
+def saving_recipe(recipe_id: int):
+    """Правка рецепта, после которой его строка будет сохранена."""
+    token = _saving.set(_saving.get() | {recipe_id})
+    try:
+        yield
+    finally:
+        _saving.reset(token)
+
+
+def will_save(recipe_id: int) -> bool:
+    return recipe_id in _saving.get()
+
+
+def touch_recipes(**lookup) -> None:
+    """Обновляет дату изменения рецептов, подходящих под lookup."""
+    Recipe.objects.filter(**lookup).update(updated_at=timezone.now())
+
+
+def mark_similar_stale(*recipe_ids: int) -> None:
+    """Помечает рецепты, соседей которых пересчитает compute_similar.
+
+    Старые соседи остаются в ответах до пересчета.
+    """
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        similar_changed_at=timezone.now()
+    )
+
+
+def refresh_tags_mask(recipe_ids: set[int]) -> None:
+    """Пересчитывает битовую маску тегов у рецептов."""
+    masks = dict.fromkeys(recipe_ids, 0)
+    for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list("recipe_id", "tag_id"):
+        masks[recipe_id] |= tag_bit(tag_id)
+    grouped = defaultdict(list)
+    for recipe_id, mask in masks.items():
+        grouped[mask].append(recipe_id)
+    for mask, ids in grouped.items():
+        Recipe.objects.filter(pk__in=ids).update(tags_mask=mask)
+
+
+def filter_by_tags(
+    queryset: QuerySet[Recipe], slugs: list[str], match_all: bool = False
+) -> QuerySet[Recipe]:
+    """Фильтрует рецепты по тегам: любой из них или все сразу.
+
+    Фильтр по маске не требует JOIN и DISTINCT. Если у тега нет бита
+    в маске, используется фильтр по связующей таблице.
+    """
+    tag_ids = list(
+        Tag.objects.filter(slug__in=slugs).values_list("pk", flat=True)
+    )
+    if not tag_ids:
+        return queryset.none()
+    if not all(map(tag_bit, tag_ids)):
+        if not match_all:
+            return queryset.filter(
+                pk__in=Recipe.tags.through.objects.filter(
+                    tag_id__in=tag_ids
+                ).values("recipe_id")
+            )
+        for tag_id in tag_ids:
+            queryset = queryset.filter(tags=tag_id)
+        return queryset
+    mask = sum(map(tag_bit, tag_ids))
+    queryset = queryset.alias(tag_bits=F("tags_mask").bitand(mask))
+    if match_all:
+        return queryset.filter(tag_bits=mask)
+    return queryset.exclude(tag_bits=0)
+
+
+def filter_by_tag_slugs(
+    queryset: QuerySet[Recipe], slugs: list[str], match_all: bool = False
+) -> QuerySet[Recipe]:
+    """Тот же фильтр, что filter_by_tags, без отдельного запроса тегов.
+
+    Теги ищутся по slug в подзапросе к связующей таблице, поэтому ETag
+    списка с ?tags= стоит одного запроса.
+    """
+    links = Recipe.tags.through.objects.filter(tag__slug__in=slugs).values(
+        "recipe_id"
+    )
+    if match_all:
+        # Рецепт должен иметь все существующие теги из slugs.
+        found = Tag.objects.filter(slug__in=slugs).values(
+            total=Func("pk", function="COUNT")
+        )
+        links = links.annotate(matched=Count("tag_id")).filter(
+            matched=Subquery(found)
+        )
+    return queryset.filter(pk__in=links.values("recipe_id"))
+
+
+def search_ingredients(name: str | None) -> list[dict]:
+    """Ищет ингредиенты: сначала по началу названия, затем по сходству."""
+    if not name:
+        return ingredient_index.all()
+    return ingredient_index.search(name)
+
+
+def shopping_list_ingredients(user: User) -> QuerySet[dict]:
+    """Суммирует ингредиенты рецептов из списка покупок."""
+    return (
         AmountIngredient.objects.filter(recipe__in_carts__user=user)
         .values(
             "ingredients__name",
@@ -37,6 +224,15 @@ def create_shopping_list(user: User) -> str:
         .annotate(amount=Sum("amount"))
     )
 
+
+def create_shopping_list(user: User) -> str:
+    """Создает список покупок."""
+    shopping_list = [
+        f"Список покупок для:\n\n{user.first_name}\n"
+        f'{datetime.now().strftime("%d/%m/%Y %H:%M")}\n'
+    ]
+    ingredients = shopping_list_ingredients(user)
+
     ingredient_list = (
         f'{ing["ingredients__name"]}: {ing["amount"]} {ing["measurement"]}'
         for ing in ingredients
@@ -44,3 +240,40 @@ def create_shopping_list(user: User) -> str:
     shopping_list.extend(ingredient_list)
     shopping_list.append("\nСоставлено в Foodgram")
     return "\n".join(shopping_list)
+
+
+def change_counter(
+    model: type[Model], pk: int, field: str, delta: int
+) -> None:
+    """Атомарно изменяет денормализованный счетчик."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def recount_counters() -> dict[str, int]:
+    """Исправляет расхождения счетчиков с реальными данными.
+
+    Возвращает количество исправленных строк для каждого счетчика.
+    """
+    fixed = {}
+    for model, field, related_model, related_field in COUNTERS:
+        actual = Coalesce(
+            Subquery(
+                related_model.objects.order_by()
+                .filter(**{related_field: OuterRef("pk")})
+                .values(related_field)
+                .annotate(total=Count("pk"))
+                .values("total")
+            ),
+            0,
+        )
+        drifted = [
+            model(pk=pk, **{field: value})
+            for pk, value in model.objects.annotate(actual=actual)
+            .exclude(**{field: F("actual")})
+            .values_list("pk", "actual")
+        ]
+        model.objects.bulk_update(drifted, (field,), batch_size=1000)
+        fixed[f"{model.__name__}.{field}"] = len(drifted)
+    return fixed
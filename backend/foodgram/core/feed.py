@@ -0,0 +1,207 @@
+"""Лента рецептов авторов, на которых подписан пользователь.
+
+Гибридная модель: рецепт обычного автора после публикации раскладывается
+по лентам подписчиков (FeedEntry) фоновым потоком пачками, а рецепты
+популярных авторов (от FEED_CELEBRITY_FOLLOWERS подписчиков) подмешиваются
+при чтении. Задача раскладки (FanOutJob) пишется в одной транзакции с
+рецептом и удаляется после раскладки. Задачи, потерянные при перезапуске
+воркера или упавшие, доделывает команда fan_out_feed. Страницы листаются
+по ключу (pub_date, id), поэтому время ответа не зависит ни от глубины,
+ни от количества подписок.
+"""
+import logging
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from recipes.models import FanOutJob, FeedEntry, Recipe
+from users.models import Subscriptions, User
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="feed")
+
+FeedKey = tuple[datetime, int]
+
+
+def is_celebrity(followers_count: int) -> bool:
+    return followers_count >= settings.FEED_CELEBRITY_FOLLOWERS
+
+
+def schedule_fan_out(recipe: Recipe) -> None:
+    """Записывает задачу раскладки и ставит ее в фоновую очередь."""
+    FanOutJob.objects.create(recipe=recipe)
+    recipe_id = recipe.pk
+    transaction.on_commit(
+        lambda: _executor.submit(_fan_out_in_thread, recipe_id)
+    )
+
+
+def _fan_out_in_thread(recipe_id: int) -> None:
+    try:
+        fan_out(recipe_id)
+    except Exception:
+        # Задача остается в FanOutJob, ее повторит fan_out_feed.
+        logger.exception("Не удалось разложить рецепт %s по лентам", recipe_id)
+    finally:
+        connection.close()
+
+
+def fan_out(recipe_id: int) -> None:
+    """Раскладывает рецепт по лентам подписчиков пачками.
+
+    Повторный запуск безопасен: записи ленты уникальны.
+    """
+    recipe = (
+        Recipe.objects.filter(pk=recipe_id)
+        .values("author_id", "pub_date", "author__followers_count")
+        .first()
+    )
+    if recipe is not None and not is_celebrity(
+        recipe["author__followers_count"]
+    ):
+        subscriptions = Subscriptions.objects.filter(
+            author_id=recipe["author_id"]
+        ).order_by("pk")
+        last_pk = 0
+        while True:
+            batch = list(
+                subscriptions.filter(pk__gt=last_pk).values_list(
+                    "pk", "user_id"
+                )[: settings.FEED_FANOUT_BATCH]
+            )
+            if not batch:
+                break
+            FeedEntry.objects.bulk_create(
+                (
+                    FeedEntry(
+                        user_id=user_id,
+                        recipe_id=recipe_id,
+                        author_id=recipe["author_id"],
+                        pub_date=recipe["pub_date"],
+                    )
+                    for _, user_id in batch
+                ),
+                ignore_conflicts=True,
+            )
+            last_pk = batch[-1][0]
+    FanOutJob.objects.filter(recipe_id=recipe_id).delete()
+
+
+def fan_out_pending(older_than: float) -> tuple[int, int]:
+    """Доделывает задачи раскладки старше older_than секунд.
+
+    Свежие задачи еще может выполнять фоновый поток воркера. Возвращает
+    число выполненных и упавших задач.
+    """
+    created_before = timezone.now() - timedelta(seconds=older_than)
+    done = failed = 0
+    for recipe_id in FanOutJob.objects.filter(
+        created_at__lte=created_before
+    ).values_list("recipe_id", flat=True):
+        try:
+            fan_out(recipe_id)
+        except Exception:
+            logger.exception(
+                "Не удалось разложить рецепт %s по лентам", recipe_id
+            )
+            failed += 1
+        else:
+            done += 1
+    return done, failed
+
+
+def backfill(user_id: int, author_id: int) -> None:
+    """Добавляет в ленту последние рецепты нового автора из подписок."""
+    followers_count = (
+        User.objects.filter(pk=author_id)
+        .values_list("followers_count", flat=True)
+        .first()
+    )
+    if followers_count is None or is_celebrity(followers_count):
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).values_list(
+        "pk", "pub_date"
+    )[: settings.FEED_BACKFILL]
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for recipe_id, pub_date in recipes
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def forget_author(user_id: int, author_id: int) -> None:
+    """Убирает из ленты рецепты автора после отписки."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild() -> int:
+    """Заново раскладывает рецепты по лентам всех подписчиков."""
+    FeedEntry.objects.all().delete()
+    subscriptions = Subscriptions.objects.values_list("user_id", "author_id")
+    for user_id, author_id in subscriptions.iterator():
+        backfill(user_id, author_id)
+    return FeedEntry.objects.count()
+
+
+def encode_cursor(key: FeedKey) -> str:
+    pub_date, recipe_id = key
+    raw = f"{pub_date.isoformat()}|{recipe_id}"
+    return urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> FeedKey:
+    """Разбирает курсор; ValueError, если он поврежден."""
+    try:
+        pub_date, recipe_id = urlsafe_b64decode(cursor).decode().split("|")
+        return datetime.fromisoformat(pub_date), int(recipe_id)
+    except (TypeError, UnicodeDecodeError) as error:
+        raise ValueError(cursor) from error
+
+
+def _before(key: FeedKey | None, date_field: str, id_field: str) -> Q:
+    if key is None:
+        return Q()
+    pub_date, recipe_id = key
+    return Q(**{f"{date_field}__lt": pub_date}) | Q(
+        **{date_field: pub_date, f"{id_field}__lt": recipe_id}
+    )
+
+
+def get_feed(
+    user: User, limit: int, cursor: FeedKey | None = None
+) -> tuple[list[int], FeedKey | None]:
+    """Возвращает id рецептов страницы ленты и ключ следующей страницы."""
+    pushed = (
+        FeedEntry.objects.filter(
+            _before(cursor, "pub_date", "recipe_id"), user=user
+        )
+        .order_by("-pub_date", "-recipe_id")
+        .values_list("pub_date", "recipe_id")[: limit + 1]
+    )
+    celebrities = User.objects.filter(
+        subscriptions__user=user,
+        followers_count__gte=settings.FEED_CELEBRITY_FOLLOWERS,
+    ).values("pk")
+    pulled = (
+        Recipe.objects.filter(
+            _before(cursor, "pub_date", "id"), author__in=celebrities
+        )
+        .order_by("-pub_date", "-id")
+        .values_list("pub_date", "id")[: limit + 1]
+    )
+    keys = sorted(set(pushed) | set(pulled), reverse=True)[: limit + 1]
+    next_key = keys[limit - 1] if len(keys) > limit else None
+    return [recipe_id for _, recipe_id in keys[:limit]], next_key
@@ -0,0 +1,253 @@
+"""Метрики приложения в текстовом формате Prometheus.
+
+Каждый процесс gunicorn копит значения в памяти и периодически сбрасывает
+их в свой файл в каталоге ``settings.METRICS_DIR``. Эндпоинт метрик читает
+файлы всех процессов и суммирует значения, поэтому внешний сервис не нужен.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+PREFIX = "foodgram_"
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+METRICS = {
+    "http_requests_total": (
+        COUNTER, "Количество обработанных HTTP-запросов."
+    ),
+    "http_request_duration_seconds": (
+        HISTOGRAM, "Время обработки HTTP-запроса."
+    ),
+    "db_queries_total": (
+        COUNTER, "Количество SQL-запросов, выполненных при обработке вью."
+    ),
+    "app_cache_requests_total": (
+        COUNTER, "Обращения к кешам приложения (result: hit, miss, stale)."
+    ),
+    "compression_duration_seconds": (
+        HISTOGRAM, "Время сжатия ответа."
+    ),
+    "response_bytes_total": (
+        COUNTER, "Байты сжатых ответов до и после сжатия (stage: raw, sent)."
+    ),
+    "shopping_list_duration_seconds": (
+        HISTOGRAM, "Время формирования списка покупок."
+    ),
+    "image_processing_queue_depth": (
+        GAUGE, "Количество изображений, ожидающих обработки."
+    ),
+}
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(
+            key,
+            value.replace("\\", "\\\\").replace('"', '\\"'),
+        )
+        for key, value in pairs
+    )
+    return f"{{{body}}}"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """Метрики текущего процесса с файловым хранилищем."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pid = None
+        self._values = {}
+        self._last_flush = 0.0
+
+    @property
+    def directory(self) -> Path:
+        return Path(settings.METRICS_DIR)
+
+    def _path(self, pid: int) -> Path:
+        return self.directory / f"{pid}.json"
+
+    def _ensure_process(self) -> None:
+        """Сбрасывает унаследованные при fork значения."""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        self._pid = pid
+        self._values = {}
+        self._last_flush = 0.0
+        # pid мог достаться от завершившегося воркера: счетчики продолжаются.
+        for name, labels, value in self._read(self._path(pid)):
+            if METRICS[name][0] != GAUGE:
+                self._values[(name, labels)] = value
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Увеличивает счетчик или gauge."""
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._ensure_process()
+            self._values[key] = self._values.get(key, 0) + value
+
+    def dec(self, name: str, value: float = 1, **labels) -> None:
+        """Уменьшает gauge."""
+        self.inc(name, -value, **labels)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Добавляет наблюдение в гистограмму."""
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._ensure_process()
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = [0] * (len(DEFAULT_BUCKETS) + 2)
+                self._values[key] = histogram
+            histogram[bisect_left(DEFAULT_BUCKETS, value)] += 1
+            histogram[-1] += value
+
+    def flush(self, force: bool = False) -> None:
+        """Сохраняет значения процесса в файл не чаще интервала."""
+        now = time.monotonic()
+        with self._lock:
+            self._ensure_process()
+            if (
+                not force
+                and now - self._last_flush < settings.METRICS_FLUSH_INTERVAL
+            ):
+                return
+            self._last_flush = now
+            payload = [
+                [name, labels, value]
+                for (name, labels), value in self._values.items()
+            ]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(self._pid)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(payload))
+        os.replace(tmp_path, path)
+
+    def _read(self, path: Path) -> list[tuple]:
+        try:
+            payload = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return []
+        return [
+            (name, tuple(map(tuple, labels)), value)
+            for name, labels, value in payload
+            if name in METRICS
+        ]
+
+    def collect(self) -> dict:
+        """Суммирует значения всех процессов."""
+        self.flush(force=True)
+        total = {}
+        for path in self.directory.glob("*.json"):
+            alive = path.stem.isdigit() and _pid_alive(int(path.stem))
+            for name, labels, value in self._read(path):
+                if METRICS[name][0] == GAUGE and not alive:
+                    continue
+                key = (name, labels)
+                if isinstance(value, list):
+                    current = total.setdefault(key, [0] * len(value))
+                    for idx, item in enumerate(value):
+                        current[idx] += item
+                else:
+                    total[key] = total.get(key, 0) + value
+        return total
+
+    def render(self) -> str:
+        """Формирует ответ в текстовом формате Prometheus."""
+        values = self.collect()
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            full_name = PREFIX + name
+            lines.append(f"# HELP {full_name} {description}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            series = sorted(
+                (labels, value)
+                for (metric, labels), value in values.items()
+                if metric == name
+            )
+            for labels, value in series:
+                if kind != HISTOGRAM:
+                    formatted = _format_labels(labels)
+                    lines.append(f"{full_name}{formatted} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(DEFAULT_BUCKETS, value):
+                    cumulative += count
+                    le = _format_labels(labels, (("le", str(bound)),))
+                    lines.append(f"{full_name}_bucket{le} {cumulative}")
+                count = cumulative + value[-2]
+                le = _format_labels(labels, (("le", "+Inf"),))
+                lines.append(f"{full_name}_bucket{le} {count}")
+                lines.append(
+                    f"{full_name}_sum{_format_labels(labels)} {value[-1]}"
+                )
+                lines.append(
+                    f"{full_name}_count{_format_labels(labels)} {count}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+inc = registry.inc
+dec = registry.dec
+observe = registry.observe
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Измеряет время выполнения блока и пишет его в гистограмму."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def in_progress(name: str, **labels):
+    """Учитывает блок в gauge на время его выполнения."""
+    inc(name, **labels)
+    try:
+        yield
+    finally:
+        dec(name, **labels)
+
+
+def cache_lookup(cache_name: str, hit: bool) -> None:
+    """Учитывает попадание или промах кеша приложения."""
+    inc(
+        "app_cache_requests_total",
+        cache=cache_name,
+        result="hit" if hit else "miss",
+    )
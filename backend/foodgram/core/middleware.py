@@ -0,0 +1,235 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from hashlib import sha256
+
+from core import metrics
+from core.compression import (
+    choose_encoding,
+    compress,
+    compress_reused,
+    compress_stream,
+)
+from core.routers import allow_replica_for, is_read_only, replica_reads
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+_query_counter: ContextVar[list[int] | None] = ContextVar(
+    "query_counter", default=None
+)
+
+
+def count_queries(execute, sql, params, many, context):
+    """Считает SQL-запросы текущего HTTP-запроса."""
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs) -> None:
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def get_view_name(view_func, method: str) -> str:
+    """Возвращает имя вью для меток метрик: Класс.действие."""
+    view_class = getattr(view_func, "cls", None)
+    if view_class is None:
+        return getattr(view_func, "__qualname__", view_func.__class__.__name__)
+    actions = getattr(view_func, "actions", None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f"{view_class.__name__}.{action}"
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """Считает запросы, время их обработки и количество SQL-запросов.
+
+    Работает и в WSGI, и в ASGI режиме, не переводя асинхронные вью
+    в синхронный поток.
+    """
+
+    def __init__(self, get_response) -> None:
+        super().__init__(get_response)
+        for connection in connections.all():
+            install_query_counter(None, connection)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self._acall(request)
+        counter = [0]
+        token = _query_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_counter.reset(token)
+        self._record(request, response, time.perf_counter() - start, counter)
+        return response
+
+    async def _acall(self, request):
+        counter = [0]
+        token = _query_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_counter.reset(token)
+        self._record(request, response, time.perf_counter() - start, counter)
+        return response
+
+    def _record(self, request, response, duration: float, counter) -> None:
+        view = getattr(request, "metrics_view", "unmatched")
+        metrics.inc(
+            "http_requests_total",
+            view=view,
+            method=request.method,
+            status=response.status_code,
+        )
+        metrics.observe("http_request_duration_seconds", duration, view=view)
+        if counter[0]:
+            metrics.inc("db_queries_total", counter[0], view=view)
+        metrics.registry.flush()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = get_view_name(view_func, request.method)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Сжимает ответы API с типами из COMPRESSION_CONTENT_TYPES.
+
+    Обычные ответы короче COMPRESSION_MIN_SIZE байт отдаются как есть.
+    Как и в GZipMiddleware, сильный ETag становится слабым: сжатое тело
+    отличается побайтно, но по смыслу то же.
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self._acall(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def _acall(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        content_type = response.get("Content-Type", "").partition(";")[0]
+        if (
+            content_type.strip() not in settings.COMPRESSION_CONTENT_TYPES
+            or response.has_header("Content-Encoding")
+        ):
+            return response
+        if not response.streaming and (
+            len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = choose_encoding(
+            request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding
+            )
+            del response["Content-Length"]
+        else:
+            view = getattr(request, "metrics_view", "unmatched")
+            with metrics.timer(
+                "compression_duration_seconds", view=view, encoding=encoding
+            ):
+                if getattr(response, "reuse_compressed", False):
+                    compressed = compress_reused(response.content, encoding)
+                else:
+                    compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            metrics.inc(
+                "response_bytes_total",
+                len(response.content),
+                view=view,
+                stage="raw",
+            )
+            metrics.inc(
+                "response_bytes_total",
+                len(compressed),
+                view=view,
+                stage="sent",
+            )
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
+        return response
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """Разрешает чтение с реплик и закрепляет писавших за основной БД.
+
+    Закрепление хранится в кеше default, общем для воркеров, поэтому
+    следующий запрос клиента читает с основной БД на любом из них. POST к
+    вью с read_only считается чтением и клиента не закрепляет.
+    """
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self._acall(request)
+        # Решение принимается в process_view, когда известно вью.
+        with replica_reads() as state:
+            request.replica_state = state
+            response = self.get_response(request)
+        self._finish(request, response)
+        return response
+
+    async def _acall(self, request):
+        with replica_reads() as state:
+            request.replica_state = state
+            response = await self.get_response(request)
+        self._finish(request, response)
+        return response
+
+    @staticmethod
+    def _pin_key(request) -> str | None:
+        client = request.META.get("HTTP_AUTHORIZATION") or request.COOKIES.get(
+            settings.SESSION_COOKIE_NAME
+        )
+        if not client:
+            return None
+        return "db-pin:" + sha256(client.encode()).hexdigest()
+
+    def _finish(self, request, response) -> None:
+        pin_key = self._pin_key(request)
+        if (
+            pin_key is not None
+            and request.method not in SAFE_METHODS
+            and not getattr(request, "read_only", False)
+            and response.status_code < 400
+        ):
+            cache.set(pin_key, True, settings.REPLICA_PIN_SECONDS)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = getattr(request, "replica_state", None)
+        request.read_only = is_read_only(view_func)
+        if state is None or (
+            request.method not in SAFE_METHODS and not request.read_only
+        ):
+            return
+        pin_key = self._pin_key(request)
+        # Закрепленным не отдаются и общие кеши, собранные по репликам.
+        request.pinned_to_primary = bool(pin_key and cache.get(pin_key))
+        state[0] = (
+            allow_replica_for(view_func, request.method)
+            and not request.pinned_to_primary
+        )
@@ -0,0 +1,25 @@
+class DenormalizedFieldsMixin:
+    """Полное сохранение не трогает поля из denormalized_fields.
+
+    Счетчики и маски меняются F()-выражениями в обход объекта, и значения
+    в памяти могут устареть. Поэтому save() без update_fields записывает
+    все поля, кроме этих.
+    """
+
+    denormalized_fields: tuple[str, ...] = ()
+
+    def save(self, *args, **kwargs) -> None:
+        if (
+            not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.denormalized_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
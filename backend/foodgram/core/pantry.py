@@ -0,0 +1,180 @@
+"""Поиск рецептов по ингредиентам, которые есть у пользователя.
+
+Инвертированный индекс хранится в памяти процесса: для каждого ингредиента
+отсортированный массив id рецептов и для каждого рецепта число его
+ингредиентов. Покрытие считается одним ``bincount`` по склеенным массивам
+ингредиентов из запроса, без GROUP BY по AmountIngredient.
+
+Изменения рецептов записываются в журнал в кеше блокировок
+(``pantry:change:<номер>``), общем для всех процессов. Номер записи
+занимается атомарным add, поэтому одновременные изменения не затирают
+друг друга. Каждый процесс перед запросом дочитывает журнал подряд от своей
+версии, перечитывая из БД только измененные рецепты. Если в журнале дыра
+(записи устарели) или изменений слишком много, индекс строится заново.
+"""
+import threading
+from functools import partial
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db import transaction
+
+from recipes.models import AmountIngredient
+
+# Последний занятый номер журнала: подсказка, с какого номера искать
+# свободный. При гонке может отстать, но не опережает журнал.
+VERSION_KEY = "pantry:version"
+CHANGE_KEY = "pantry:change:{}"
+# Сколько записей журнала читается одним запросом к кешу.
+JOURNAL_BATCH = 100
+
+ID_TYPE = np.int32
+
+
+def journal() -> BaseCache:
+    return caches[settings.LOCK_CACHE_ALIAS]
+
+
+def record_change(recipe_id: int) -> None:
+    """Добавляет рецепт в журнал изменений индекса."""
+    version = journal().get(VERSION_KEY, 0) + 1
+    while not journal().add(
+        CHANGE_KEY.format(version), recipe_id, settings.PANTRY_JOURNAL_TTL
+    ):
+        version += 1
+    journal().set(VERSION_KEY, version, None)
+
+
+def schedule_change(recipe_id: int) -> None:
+    """Записывает изменение рецепта после коммита транзакции."""
+    transaction.on_commit(partial(record_change, recipe_id))
+
+
+class PantryIndex:
+    """Индекс ингредиент -> рецепты текущего процесса."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._version = None
+        self._postings: dict[int, np.ndarray] = {}
+        self._sizes = np.zeros(0, dtype=ID_TYPE)
+
+    def _build(self) -> None:
+        rows = (
+            AmountIngredient.objects.order_by()
+            .values_list("ingredients_id", "recipe_id")
+            .iterator(chunk_size=10000)
+        )
+        pairs = np.fromiter(chain.from_iterable(rows), dtype=ID_TYPE)
+        ingredients, recipes = pairs[0::2], pairs[1::2]
+        order = np.lexsort((recipes, ingredients))
+        ingredients, recipes = ingredients[order], recipes[order]
+        keys, starts = np.unique(ingredients, return_index=True)
+        self._postings = dict(
+            zip(keys.tolist(), np.split(recipes, starts[1:]))
+        )
+        self._sizes = np.bincount(recipes).astype(ID_TYPE)
+
+    def _apply(self, recipe_ids: set[int]) -> None:
+        changed = np.array(sorted(recipe_ids), dtype=ID_TYPE)
+        for ingredient, postings in self._postings.items():
+            positions = np.searchsorted(postings, changed)
+            positions = positions[positions < len(postings)]
+            stale = positions[np.isin(postings[positions], changed)]
+            if len(stale):
+                self._postings[ingredient] = np.delete(postings, stale)
+
+        high = int(changed[-1]) + 1
+        if high > len(self._sizes):
+            self._sizes = np.pad(self._sizes, (0, high - len(self._sizes)))
+        self._sizes[changed] = 0
+
+        rows = AmountIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list("ingredients_id", "recipe_id")
+        for ingredient, recipe_id in rows:
+            postings = self._postings.get(ingredient, np.zeros(0, ID_TYPE))
+            self._postings[ingredient] = np.insert(
+                postings, np.searchsorted(postings, recipe_id), recipe_id
+            )
+            self._sizes[recipe_id] += 1
+
+    def _read_journal(self) -> tuple[int, set[int]] | None:
+        """Последний номер журнала и рецепты, измененные после индекса.
+
+        None, если журнал не дочитать: записи устарели или их больше
+        PANTRY_MAX_REPLAY.
+        """
+        latest = journal().get(VERSION_KEY, 0)
+        version, changed = self._version, set()
+        while version - self._version <= settings.PANTRY_MAX_REPLAY:
+            keys = [
+                CHANGE_KEY.format(number)
+                for number in range(version + 1, version + JOURNAL_BATCH + 1)
+            ]
+            found = journal().get_many(keys)
+            for key in keys:
+                if key not in found:
+                    break
+                changed.add(found[key])
+                version += 1
+            else:
+                continue
+            break
+        if version < latest or (
+            version - self._version > settings.PANTRY_MAX_REPLAY
+        ):
+            return None
+        return version, changed
+
+    def sync(self) -> None:
+        """Догоняет журнал изменений или пересобирает индекс."""
+        changes = None if self._version is None else self._read_journal()
+        if changes is None:
+            # Записи после этого номера применятся повторно, это безопасно:
+            # _apply перечитывает рецепты из БД.
+            version = journal().get(VERSION_KEY, 0)
+            self._build()
+            self._version = version
+            return
+        self._version, changed = changes
+        if changed:
+            self._apply(changed)
+
+    def search(
+        self, ingredient_ids: set[int], missing: int | None = None
+    ) -> list[tuple[int, int, int]]:
+        """Рецепты по убыванию покрытия: (id, есть, не хватает)."""
+        with self._lock:
+            self.sync()
+            arrays = [
+                self._postings[ingredient]
+                for ingredient in ingredient_ids
+                if ingredient in self._postings
+            ]
+            if not arrays:
+                return []
+            covered = np.bincount(
+                np.concatenate(arrays), minlength=len(self._sizes)
+            )
+            recipes = np.flatnonzero(covered)
+            matched = covered[recipes]
+            lacking = self._sizes[recipes] - matched
+        if missing is not None:
+            fits = lacking <= missing
+            recipes, matched, lacking = (
+                recipes[fits], matched[fits], lacking[fits]
+            )
+        order = np.lexsort((-recipes, lacking, -matched))
+        return list(
+            zip(
+                recipes[order].tolist(),
+                matched[order].tolist(),
+                lacking[order].tolist(),
+            )
+        )
+
+
+index = PantryIndex()
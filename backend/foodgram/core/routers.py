@@ -0,0 +1,102 @@
+"""Маршрутизация чтения на реплики БД.
+
+Чтение уходит на реплику только внутри безопасных запросов к вью, которые
+это разрешили. Пользователь, выполнивший запись, REPLICA_PIN_SECONDS секунд
+читает с основной БД, чтобы видеть свои изменения. Вью с read_only только
+читают, хотя принимают POST: такой запрос не закрепляет клиента, а решение
+о реплике принимается для каждого его подзапроса.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+_replica_allowed: ContextVar[list[bool] | None] = ContextVar(
+    "replica_allowed", default=None
+)
+_down_until: dict[str, float] = {}
+# app_label модели DatabaseCache.
+CACHE_APP = "django_cache"
+
+
+def replica_read(view):
+    """Разрешает функции-вью читать с реплики."""
+    view.replica_read = True
+    return view
+
+
+def allow_replica_for(view_func, method: str) -> bool:
+    """Проверяет, разрешило ли вью чтение с реплики для данного метода."""
+    if getattr(view_func, "replica_read", False):
+        return True
+    view_class = getattr(view_func, "cls", None)
+    actions = getattr(view_func, "actions", None) or {}
+    return actions.get(method.lower()) in getattr(
+        view_class, "replica_actions", ()
+    )
+
+
+def is_read_only(view_func) -> bool:
+    """Только ли читает вью, даже если принимает POST."""
+    view_class = getattr(view_func, "cls", None)
+    return getattr(view_func, "read_only", False) or getattr(
+        view_class, "read_only", False
+    )
+
+
+@contextmanager
+def replica_reads(allowed: bool = False):
+    """Разрешает или запрещает чтение с реплики внутри блока.
+
+    Отдает изменяемое решение [allowed]: его можно поменять внутри блока,
+    когда станет известно вью.
+    """
+    state = [allowed]
+    token = _replica_allowed.set(state)
+    try:
+        yield state
+    finally:
+        _replica_allowed.reset(token)
+
+
+def _is_available(alias: str) -> bool:
+    if _down_until.get(alias, 0) > time.monotonic():
+        return False
+    connection = connections[alias]
+    if connection.connection is not None:
+        return True
+    try:
+        connection.ensure_connection()
+    except DatabaseError:
+        _down_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+        return False
+    return True
+
+
+class ReplicaRouter:
+    """Читает с доступной реплики, пишет в основную БД."""
+
+    def db_for_read(self, model, **hints) -> str | None:
+        state = _replica_allowed.get()
+        # Кеш в БД (журналы и блокировки) читается только с основной БД.
+        if not state or not state[0] or model._meta.app_label == CACHE_APP:
+            return None
+        replicas = list(settings.DATABASE_REPLICAS)
+        random.shuffle(replicas)
+        for alias in replicas:
+            if _is_available(alias):
+                return alias
+        return None
+
+    def db_for_write(self, model, **hints) -> str:
+        # Без явного ответа Django пишет в БД, из которой объект прочитан.
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        return True
+
+    def allow_migrate(self, db, app_label, **hints) -> bool:
+        return db not in settings.DATABASE_REPLICAS
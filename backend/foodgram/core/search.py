@@ -0,0 +1,109 @@
+"""Полнотекстовый поиск рецептов по названию и описанию.
+
+В PostgreSQL используется хранимая генерируемая колонка
+``recipes_recipe.search_vector`` (конфигурация russian, название с весом A,
+описание с весом B) с GIN-индексом, поэтому она всегда совпадает с
+рецептом. В SQLite для локальной разработки используется таблица FTS5
+``recipes_recipe_fts``, которую синхронизируют сигналы рецепта.
+
+Релевантность умножается на популярность рецепта: число добавлений
+в избранное с логарифмическим весом.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, QuerySet
+from django.db.models.expressions import RawSQL
+
+from recipes.models import Recipe
+
+POPULARITY_WEIGHT = 0.1
+
+POSTGRESQL_MATCH = (
+    "recipes_recipe.search_vector @@ websearch_to_tsquery('russian', %s)"
+)
+POSTGRESQL_RANK = (
+    "ts_rank(recipes_recipe.search_vector, "
+    "websearch_to_tsquery('russian', %s), 32)"
+)
+SQLITE_MATCH = (
+    "SELECT rowid FROM recipes_recipe_fts WHERE recipes_recipe_fts MATCH %s"
+)
+SQLITE_RANK = (
+    "SELECT -bm25(recipes_recipe_fts, 10.0, 1.0) FROM recipes_recipe_fts "
+    "WHERE recipes_recipe_fts MATCH %s AND rowid = recipes_recipe.id"
+)
+POPULARITY = "(1 + {} * LN(1 + recipes_recipe.favorites_count))".format(
+    POPULARITY_WEIGHT
+)
+
+
+def _fts5_query(text: str) -> str | None:
+    """Экранирует пользовательский ввод: слова ищутся по префиксу."""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+def search_recipes(queryset: QuerySet[Recipe], text: str) -> QuerySet[Recipe]:
+    """Оставляет найденные рецепты и сортирует их по релевантности."""
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        return (
+            queryset.alias(
+                search_match=RawSQL(
+                    POSTGRESQL_MATCH, (text,), output_field=BooleanField()
+                )
+            )
+            .filter(search_match=True)
+            .annotate(
+                search_rank=RawSQL(
+                    f"{POSTGRESQL_RANK} * {POPULARITY}",
+                    (text,),
+                    output_field=FloatField(),
+                )
+            )
+            .order_by("-search_rank", "-pub_date")
+        )
+    if vendor == "sqlite":
+        query = _fts5_query(text)
+        if query is None:
+            return queryset.none()
+        return (
+            queryset.filter(pk__in=RawSQL(SQLITE_MATCH, (query,)))
+            .annotate(
+                search_rank=RawSQL(
+                    f"({SQLITE_RANK}) * {POPULARITY}",
+                    (query,),
+                    output_field=FloatField(),
+                )
+            )
+            .order_by("-search_rank", "-pub_date")
+        )
+    return queryset.filter(name__icontains=text)
+
+
+def index_recipe(recipe: Recipe, using: str) -> None:
+    """Обновляет рецепт в таблице FTS5 (только SQLite)."""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM recipes_recipe_fts WHERE rowid = %s", (recipe.pk,)
+        )
+        cursor.execute(
+            "INSERT INTO recipes_recipe_fts (rowid, name, text) "
+            "VALUES (%s, %s, %s)",
+            (recipe.pk, recipe.name, recipe.text),
+        )
+
+
+def unindex_recipe(recipe_id: int, using: str) -> None:
+    """Удаляет рецепт из таблицы FTS5 (только SQLite)."""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM recipes_recipe_fts WHERE rowid = %s", (recipe_id,)
+        )
@@ -0,0 +1,182 @@
+"""Расчет похожих рецептов по общим ингредиентам и тегам.
+
+Рецепты представлены разреженными бинарными векторами (ингредиенты и теги)
+с нормой 1, сходство — косинус. Кандидаты в соседи ищутся только по общим
+ингредиентам, которые встречаются не слишком часто (как соль или вода):
+иначе пачка строк произведения матриц становится почти плотной. Для
+кандидатов сходство считается по полным векторам.
+
+Рецепт устарел, если его similar_changed_at позже similar_computed_at или
+соседей для него еще не считали. Вместе с устаревшими пересчитываются
+рецепты, в чьих списках они есть, и рецепты с общими ингредиентами: в их
+списки устаревшие рецепты могут войти или из них выйти.
+"""
+from itertools import chain
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from scipy import sparse
+
+from recipes.models import AmountIngredient, Recipe, SimilarRecipe
+
+CANDIDATES_PER_NEIGHBOUR = 20
+
+
+def _pairs(queryset) -> np.ndarray:
+    values = chain.from_iterable(queryset.order_by().iterator(10000))
+    return np.fromiter(values, dtype=np.int64).reshape(-1, 2)
+
+
+def build_matrices(
+    max_df: float,
+) -> tuple[np.ndarray, sparse.csr_matrix, sparse.csr_matrix]:
+    """Возвращает id рецептов, матрицу признаков и матрицу кандидатов."""
+    recipe_ids = np.fromiter(
+        Recipe.objects.order_by("pk").values_list("pk", flat=True),
+        dtype=np.int64,
+    )
+    ingredients = _pairs(
+        AmountIngredient.objects.values_list("recipe_id", "ingredients_id")
+    )
+    tags = _pairs(
+        Recipe.tags.through.objects.values_list("recipe_id", "tag_id")
+    )
+    tag_offset = int(ingredients[:, 1].max(initial=0)) + 1
+    rows = np.searchsorted(
+        recipe_ids, np.concatenate((ingredients[:, 0], tags[:, 0]))
+    )
+    columns = np.concatenate((ingredients[:, 1], tags[:, 1] + tag_offset))
+    shape = (len(recipe_ids), tag_offset + int(tags[:, 1].max(initial=0)) + 1)
+
+    features = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, columns)), shape=shape
+    )
+    features.data[:] = 1
+    norms = np.sqrt(np.asarray(features.sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    features = sparse.diags(1 / norms) @ features
+
+    candidates = features[:, :tag_offset].astype(bool).astype(np.float32)
+    frequency = np.asarray(candidates.sum(axis=0)).ravel()
+    common = frequency > max(max_df * len(recipe_ids), 1)
+    candidates = candidates @ sparse.diags((~common).astype(np.float32))
+    candidates.eliminate_zeros()
+    return recipe_ids, features.tocsr(), candidates.tocsr()
+
+
+def _best_per_row(
+    source: np.ndarray, target: np.ndarray, scores: np.ndarray, top: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    order = np.lexsort((-scores, source))
+    source, target, scores = source[order], target[order], scores[order]
+    starts = np.flatnonzero(np.r_[True, source[1:] != source[:-1]])
+    rank = np.arange(len(source)) - np.repeat(
+        starts, np.diff(np.r_[starts, len(source)])
+    )
+    best = rank < top
+    return source[best], target[best], scores[best]
+
+
+def top_neighbours(
+    features: sparse.csr_matrix,
+    candidates: sparse.csr_matrix,
+    rows: np.ndarray,
+    top: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Находит top ближайших соседей для строк rows.
+
+    Сначала отбираются CANDIDATES_PER_NEIGHBOUR * top кандидатов с
+    наибольшим числом общих ингредиентов, затем они ранжируются по
+    полному сходству.
+    """
+    overlap = (candidates[rows] @ candidates.T).tocoo()
+    keep = rows[overlap.row] != overlap.col
+    source, target, scores = _best_per_row(
+        rows[overlap.row[keep]],
+        overlap.col[keep],
+        overlap.data[keep],
+        CANDIDATES_PER_NEIGHBOUR * top,
+    )
+    del overlap
+    scores = np.asarray(
+        features[source].multiply(features[target]).sum(axis=1)
+    ).ravel()
+    return _best_per_row(source, target, scores, top)
+
+
+def _affected_rows(
+    recipe_ids: np.ndarray, candidates: sparse.csr_matrix
+) -> np.ndarray:
+    """Строки устаревших рецептов и рецептов, чьи соседи от них зависят."""
+    stale = np.fromiter(
+        Recipe.objects.filter(
+            Q(similar_computed_at__isnull=True)
+            | Q(similar_changed_at__gt=F("similar_computed_at"))
+        ).values_list("pk", flat=True),
+        dtype=np.int64,
+    )
+    stale = np.intersect1d(stale, recipe_ids)
+    referring = np.fromiter(
+        SimilarRecipe.objects.filter(similar_id__in=stale.tolist())
+        .order_by()
+        .values_list("recipe_id", flat=True)
+        .distinct(),
+        dtype=np.int64,
+    )
+    rows = np.searchsorted(recipe_ids, stale)
+    sharing = np.unique((candidates[rows] @ candidates.T).tocoo().col)
+    referring_rows = np.searchsorted(
+        recipe_ids, np.intersect1d(referring, recipe_ids)
+    )
+    return np.union1d(np.union1d(rows, sharing), referring_rows)
+
+
+def compute_similar(
+    full: bool = False,
+    top: int = 10,
+    batch_size: int = 200,
+    max_df: float = 0.05,
+) -> int:
+    """Пересчитывает похожие рецепты.
+
+    Без full обрабатываются устаревшие рецепты и рецепты, на списки
+    которых они влияют. Возвращает количество обработанных рецептов.
+    """
+    started = timezone.now()
+    recipe_ids, features, candidates = build_matrices(max_df)
+    if full:
+        targets = np.arange(len(recipe_ids))
+    else:
+        targets = _affected_rows(recipe_ids, candidates)
+
+    for start in range(0, len(targets), batch_size):
+        rows = targets[start:start + batch_size]
+        source, target, scores = top_neighbours(
+            features, candidates, rows, top
+        )
+        batch_ids = recipe_ids[rows].tolist()
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe_id__in=batch_ids).delete()
+            SimilarRecipe.objects.bulk_create(
+                (
+                    SimilarRecipe(
+                        recipe_id=recipe_id,
+                        similar_id=similar_id,
+                        score=score,
+                    )
+                    for recipe_id, similar_id, score in zip(
+                        recipe_ids[source].tolist(),
+                        recipe_ids[target].tolist(),
+                        scores.tolist(),
+                    )
+                ),
+                batch_size=1000,
+            )
+            # Изменения после started останутся устаревшими до следующего
+            # запуска.
+            Recipe.objects.filter(pk__in=batch_ids).update(
+                similar_computed_at=started
+            )
+    return len(targets)
@@ -0,0 +1,130 @@
+"""Нечеткий поиск ингредиентов по триграммам.
+
+Справочник ингредиентов небольшой и меняется редко, поэтому каждый процесс
+держит его в памяти вместе с инвертированным индексом триграмма -> номера
+ингредиентов. Триграммы строятся как в pg_trgm: каждое слово дополняется
+двумя пробелами слева и одним справа, сходство — отношение общих триграмм
+ко всем различным триграммам двух строк. Индекс пересобирается, когда
+сигналы ингредиентов меняют версию в кеше default. Этот кеш общий для
+воркеров, поэтому правку справочника видят все процессы. Версия только
+заменяется целиком, так что атомарный add, как у журнала core.pantry, ей
+не нужен.
+"""
+import re
+import threading
+from uuid import uuid4
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import Ingredient
+
+VERSION_KEY = "ingredients:version"
+
+
+def trigrams(text: str) -> set[str]:
+    """Триграммы строки в стиле pg_trgm."""
+    result = set()
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"  {word} "
+        result.update(
+            padded[idx:idx + 3] for idx in range(len(padded) - 2)
+        )
+    return result
+
+
+def invalidate() -> None:
+    """Помечает индексы всех процессов устаревшими после коммита."""
+    transaction.on_commit(
+        lambda: cache.set(VERSION_KEY, uuid4().hex, None)
+    )
+
+
+def index_version() -> str | None:
+    """Версия справочника ингредиентов, общая для всех процессов."""
+    return cache.get(VERSION_KEY)
+
+
+class IngredientIndex:
+    """Триграммный индекс справочника ингредиентов текущего процесса."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._version = None
+        self._built = False
+        self._rows: list[dict] = []
+        self._names: list[str] = []
+        self._sizes = np.zeros(0, dtype=np.int32)
+        self._postings: dict[str, np.ndarray] = {}
+
+    def _build(self) -> None:
+        self._rows = list(
+            Ingredient.objects.values("id", "name", "measurement_unit")
+        )
+        self._names = [row["name"].lower() for row in self._rows]
+        postings = {}
+        sizes = []
+        for position, name in enumerate(self._names):
+            grams = trigrams(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        self._sizes = np.array(sizes, dtype=np.int32)
+        self._postings = {
+            gram: np.array(positions, dtype=np.int32)
+            for gram, positions in postings.items()
+        }
+
+    def _sync(self) -> None:
+        version = index_version()
+        if not self._built or version != self._version:
+            self._build()
+            self._built = True
+            self._version = version
+
+    def all(self) -> list[dict]:
+        with self._lock:
+            self._sync()
+            return list(self._rows)
+
+    def search(self, name: str) -> list[dict]:
+        """Сначала ингредиенты, начинающиеся с name, затем по сходству.
+
+        Вхождения name в название остаются в выдаче при любом сходстве.
+        """
+        query = name.lower().strip()
+        grams = trigrams(query)
+        with self._lock:
+            self._sync()
+            rows, names, sizes = self._rows, self._names, self._sizes
+            arrays = [
+                self._postings[gram] for gram in grams
+                if gram in self._postings
+            ]
+        if not arrays:
+            shared = np.zeros(len(rows), dtype=np.int64)
+        else:
+            shared = np.bincount(np.concatenate(arrays), minlength=len(rows))
+        similarity = shared / np.maximum(sizes + len(grams) - shared, 1)
+
+        prefix = []
+        ranked = []
+        for position, item in enumerate(names):
+            if item.startswith(query):
+                prefix.append(position)
+            elif query in item:
+                ranked.append(position)
+        found = set(prefix).union(ranked)
+        threshold = settings.INGREDIENT_SIMILARITY_THRESHOLD
+        ranked.extend(
+            position
+            for position in np.flatnonzero(similarity >= threshold).tolist()
+            if position not in found
+        )
+        ranked.sort(key=lambda position: -similarity[position])
+        return [rows[position] for position in prefix + ranked]
+
+
+ingredient_index = IngredientIndex()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -32,6 +33,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.CompressionMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -61,6 +65,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "foodgram.wsgi.application"
 
+ASGI_APPLICATION = "foodgram.asgi.application"
+
 
 # Database
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -76,15 +82,106 @@ AUTH_USER_MODEL = "users.User"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "core.backends.postgresql",
         "NAME": os.getenv("POSTGRES_DB", "foodgram"),
         "USER": os.getenv("POSTGRES_USER", "foodgram_user"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
         "HOST": os.getenv("DB_HOST", ""),
         "PORT": os.getenv("DB_PORT", 5432),
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": os.getenv("DB_CONN_HEALTH_CHECKS", "true").lower() == "true",
+        "POOL_SIZE": int(os.getenv("DB_POOL_SIZE", 10)),
+        "POOL_TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+    }
+}
+
+# С пулом соединение возвращается в него в конце каждого запроса. Без пула
+# (DB_POOL_SIZE=0) соединение живет в потоке DB_CONN_MAX_AGE секунд - это
+# подходит только синхронным WSGI-воркерам.
+if DATABASES["default"]["POOL_SIZE"]:
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+
+# Реплики только для чтения: DB_REPLICA_HOSTS=replica1,replica2
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(","))):
+    DATABASE_REPLICAS.append(f"replica_{index}")
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
     }
+
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+
+# Сколько секунд после записи пользователь читает с основной БД.
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 5))
+# Через сколько секунд снова пробовать недоступную реплику.
+REPLICA_RETRY_SECONDS = int(os.getenv("REPLICA_RETRY_SECONDS", 30))
+
+
+# Cache
+# default хранит общее состояние воркеров: токены, флаги пользователей,
+# версии данных и индексов. Файловый кеш общий для всех воркеров одного
+# контейнера; при нескольких хостах укажите общий DatabaseCache, иначе
+# изменения на одном хосте видны другим только через TTL записей.
+# LocMemCache здесь не пройдет проверку api.E001.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv(
+            "CACHE_LOCATION",
+            os.path.join(tempfile.gettempdir(), "foodgram_cache"),
+        ),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 10000)),
+        },
+    },
+    # Общие ответы с рецептами и справочники: значения устаревают вместе
+    # с версиями в default. Кеш общий для воркеров, чтобы ждущие в
+    # single_flight получили значение, посчитанное другим процессом;
+    # MAX_ENTRIES ограничивает его размер.
+    "responses": {
+        "BACKEND": os.getenv(
+            "RESPONSE_CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv(
+            "RESPONSE_CACHE_LOCATION",
+            os.path.join(tempfile.gettempdir(), "foodgram_responses"),
+        ),
+        "TIMEOUT": int(os.getenv("RESPONSE_CACHE_TTL", 300)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1000)),
+        },
+    },
+    # Кеш в основной БД: add в нем атомарен для всех процессов и хостов,
+    # поэтому через него занимаются номера журналов и блокировки
+    # single_flight. Таблицу создает миграция api.0001_cache_table.
+    "locks": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "foodgram_cache",
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("LOCK_CACHE_MAX_ENTRIES", 10000)),
+        },
+    },
 }
 
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 60))
+RESPONSE_CACHE_ALIAS = os.getenv("RESPONSE_CACHE_ALIAS", "responses")
+LOCK_CACHE_ALIAS = os.getenv("LOCK_CACHE_ALIAS", "locks")
+# Множества id избранного, покупок и подписок для флагов в общих ответах.
+USER_FLAGS_TTL = int(os.getenv("USER_FLAGS_TTL", 5 * 60))
+# Пересчет промаха кеша: сколько секунд живет блокировка вычисляющего,
+# сколько ждут остальные и сколько секунд после истечения отдается старое
+# значение. CACHE_XFETCH_BETA > 1 обновляет значения раньше срока чаще.
+CACHE_LOCK_TIMEOUT = int(os.getenv("CACHE_LOCK_TIMEOUT", 30))
+CACHE_LOCK_WAIT = float(os.getenv("CACHE_LOCK_WAIT", 5))
+CACHE_STALE_SECONDS = int(os.getenv("CACHE_STALE_SECONDS", 60))
+CACHE_XFETCH_BETA = float(os.getenv("CACHE_XFETCH_BETA", 1))
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -105,12 +202,27 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ],
+    # MessagePack: Accept и Content-Type application/msgpack.
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.ORJSONRenderer",
+        "api.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.parsers.ORJSONParser",
+        "api.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_PAGINATION_CLASS": "api.pagination.PageLimitPagination",
+    "DEFAULT_CONTENT_NEGOTIATION_CLASS": (
+        "api.negotiation.QualityContentNegotiation"
+    ),
     "PAGE_SIZE": 6,
 }
 
@@ -148,3 +260,55 @@ STATIC_ROOT = BASE_DIR / "static"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+
+
+# Metrics
+METRICS_DIR = os.getenv(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), "foodgram_metrics")
+)
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+# Сети, из которых /api/metrics доступен без входа. Запросы через nginx
+# сюда не доходят: метрики закрыты в infra/nginx.conf.
+METRICS_ALLOWED_NETWORKS = os.getenv(
+    "METRICS_ALLOWED_NETWORKS", "127.0.0.1/32,::1/128"
+).split(",")
+
+
+# Batch
+# Сколько GET-запросов можно передать в /api/batch/ за раз.
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", 10))
+
+
+# Compression
+# Клиентам, которые принимают br, ответы сжимаются brotli, остальным gzip.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))
+COMPRESSION_CONTENT_TYPES = os.getenv(
+    "COMPRESSION_CONTENT_TYPES", "application/json,application/msgpack"
+).split(",")
+
+
+# Feed
+# Рецепты авторов с таким числом подписчиков не раскладываются по лентам,
+# а подмешиваются при чтении.
+FEED_CELEBRITY_FOLLOWERS = int(os.getenv("FEED_CELEBRITY_FOLLOWERS", 1000))
+FEED_FANOUT_BATCH = int(os.getenv("FEED_FANOUT_BATCH", 1000))
+FEED_BACKFILL = int(os.getenv("FEED_BACKFILL", 50))
+# fan_out_feed берет задачи раскладки старше этого числа секунд: более
+# свежие еще выполняет фоновый поток воркера.
+FEED_FANOUT_RETRY_AFTER = int(os.getenv("FEED_FANOUT_RETRY_AFTER", 60))
+
+
+# Pantry search
+# Сколько секунд хранится журнал изменений индекса и сколько изменений
+# процесс догоняет, прежде чем пересобрать индекс целиком.
+PANTRY_JOURNAL_TTL = int(os.getenv("PANTRY_JOURNAL_TTL", 24 * 60 * 60))
+PANTRY_MAX_REPLAY = int(os.getenv("PANTRY_MAX_REPLAY", 1000))
+
+
+# Ingredient search
+# Минимальное триграммное сходство для нечетких совпадений, как в pg_trgm.
+INGREDIENT_SIMILARITY_THRESHOLD = float(
+    os.getenv("INGREDIENT_SIMILARITY_THRESHOLD", 0.3)
+)
@@ -1,7 +1,8 @@
+from core.admin import AutocompleteFilter, LargeTableAdmin
 from django.contrib.admin import ModelAdmin, TabularInline, display, register
 from django.core.handlers.wsgi import WSGIRequest
 from django.utils.html import format_html
-from django.utils.safestring import SafeString, mark_safe
+from django.utils.safestring import SafeString
 
 from recipes.forms import TagForm
 from recipes.models import (AmountIngredient, Carts, Favorites, Ingredient,
@@ -13,46 +14,55 @@ EMPTY = "Значение отсутствует"
 class IngredientInline(TabularInline):
     model = AmountIngredient
     extra = 2
+    autocomplete_fields = ("ingredients",)
 
 
 @register(AmountIngredient)
-class AmountAdmin(ModelAdmin):
-    pass
+class AmountAdmin(LargeTableAdmin):
+    list_display = ("recipe", "ingredients", "amount")
+    list_select_related = ("recipe__author", "ingredients")
+    raw_id_fields = ("recipe",)
+    autocomplete_fields = ("ingredients",)
 
 
 @register(Ingredient)
-class IngredientAdmin(ModelAdmin):
+class IngredientAdmin(LargeTableAdmin):
     list_display = ("name", "measurement_unit")
     search_fields = ("name",)
-    list_filter = ("name",)
     save_on_top = True
     empty_value_display = EMPTY
 
 
 @register(Recipe)
-class RecipeAdmin(ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     list_display = ("name", "author", "get_image", "count_favorites")
+    list_select_related = ("author",)
     fields = (
         ("name", "cooking_time"),
         ("author", "tags"),
         ("text",), ("image",),
     )
     raw_id_fields = ("author",)
-    search_fields = ("name", "author__username", "tags__name")
-    list_filter = ("name", "author__username", "tags__name")
+    search_fields = ("name", "author__username")
+    list_filter = (("author", AutocompleteFilter), "tags")
     inlines = (IngredientInline,)
     save_on_top = True
     empty_value_display = EMPTY
 
-    def get_image(self, obj: Recipe) -> SafeString:
-        return mark_safe(f'<img src={obj.image.url} width="80" hieght="30"')
+    def get_image(self, obj: Recipe) -> SafeString | None:
+        if not obj.image:
+            return None
+        return format_html(
+            '<img src="{}" width="80" height="30">', obj.image.url
+        )
 
     get_image.short_description = "Изображение"
 
     def count_favorites(self, obj: Recipe) -> int:
-        return obj.in_favorites.count()
+        return obj.favorites_count
 
     count_favorites.short_description = "В избранном"
+    count_favorites.admin_order_field = "favorites_count"
 
 
 @register(Tag)
@@ -73,8 +83,9 @@ class TagAdmin(ModelAdmin):
 
 
 @register(Favorites)
-class FavoritesAdmin(ModelAdmin):
+class FavoritesAdmin(LargeTableAdmin):
     list_display = ("user", "recipe", "date_added")
+    list_select_related = ("user", "recipe__author")
     search_fields = ("user__username", "recipe__name")
 
     def has_change_permission(
@@ -89,8 +100,9 @@ class FavoritesAdmin(ModelAdmin):
 
 
 @register(Carts)
-class CartsAdmin(ModelAdmin):
+class CartsAdmin(LargeTableAdmin):
     list_display = ("user", "recipe", "date_added")
+    list_select_related = ("user", "recipe__author")
     search_fields = ("user__username", "recipe__name")
 
     def has_change_permission(
@@ -0,0 +1,40 @@
+from core.similar import compute_similar
+from django.core.management import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    Рассчитывает похожие рецепты по общим ингредиентам и тегам.
+    По умолчанию для измененных рецептов и рецептов, чьи соседи
+    от них зависят.
+    python3 manage.py compute_similar [--full]
+    """
+
+    help = "Compute similar recipes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Пересчитать соседей всех рецептов",
+        )
+        parser.add_argument("--top", type=int, default=10)
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--max-df",
+            type=float,
+            default=0.05,
+            help="Ингредиенты, которые есть в большей доле рецептов, "
+            "не используются для поиска кандидатов",
+        )
+
+    def handle(self, *args, **options):
+        total = compute_similar(
+            full=options["full"],
+            top=options["top"],
+            batch_size=options["batch_size"],
+            max_df=options["max_df"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Пересчитано рецептов: {total}")
+        )
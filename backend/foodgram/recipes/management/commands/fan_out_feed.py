@@ -0,0 +1,27 @@
+from core.feed import fan_out_pending
+from django.conf import settings
+from django.core.management import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    Раскладывает по лентам рецепты, раскладка которых потерялась или упала.
+    Запускается по расписанию, например раз в минуту.
+    python3 manage.py fan_out_feed [--older-than SECONDS]
+    """
+
+    help = "Fan out recipes left in the pending queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=float,
+            default=settings.FEED_FANOUT_RETRY_AFTER,
+            help="Брать задачи старше этого числа секунд",
+        )
+
+    def handle(self, *args, **options):
+        done, failed = fan_out_pending(options["older_than"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Разложено рецептов: {done}, ошибок: {failed}")
+        )
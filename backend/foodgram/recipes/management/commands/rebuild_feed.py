@@ -0,0 +1,17 @@
+from core.feed import rebuild
+from django.core.management import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    """
+    Пересобирает ленты подписок из таблицы подписок.
+    python3 manage.py rebuild_feed
+    """
+
+    help = "Rebuild subscription feeds"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Записей в лентах: {total}"))
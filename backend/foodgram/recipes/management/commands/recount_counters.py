@@ -0,0 +1,16 @@
+from core.features import recount_counters
+from django.core.management import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    Пересчитывает денормализованные счетчики рецептов и пользователей.
+    python3 manage.py recount_counters
+    """
+
+    help = "Recount counters"
+
+    def handle(self, *args, **options):
+        for counter, fixed in recount_counters().items():
+            self.stdout.write(f"{counter}: исправлено {fixed}")
+        self.stdout.write(self.style.SUCCESS("Счетчики пересчитаны"))
@@ -0,0 +1,40 @@
+from collections import defaultdict
+
+from django.db import migrations, models
+
+TAGS_MASK_BITS = 63
+
+
+def fill_tags_mask(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    masks = defaultdict(int)
+    for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+        "recipe_id", "tag_id"
+    ).iterator():
+        if tag_id <= TAGS_MASK_BITS:
+            masks[recipe_id] |= 1 << (tag_id - 1)
+    Recipe.objects.bulk_update(
+        (
+            Recipe(pk=recipe_id, tags_mask=mask)
+            for recipe_id, mask in masks.items()
+        ),
+        ("tags_mask",),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0008_similarrecipe"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="tags_mask",
+            field=models.BigIntegerField(
+                default=0, editable=False, verbose_name="Битовая маска тегов"
+            ),
+        ),
+        migrations.RunPython(fill_tags_mask, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0012_recipe_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="similar_changed_at",
+            field=models.DateTimeField(
+                editable=False,
+                null=True,
+                verbose_name="Изменение для похожих рецептов",
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="similar_computed_at",
+            field=models.DateTimeField(
+                editable=False,
+                null=True,
+                verbose_name="Расчет похожих рецептов",
+            ),
+        ),
+    ]
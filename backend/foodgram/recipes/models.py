@@ -1,4 +1,6 @@
 from PIL import Image
+from core import metrics
+from core.models import DenormalizedFieldsMixin
 from core.validators import StrValidator, hex_color_validator
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
@@ -9,6 +11,13 @@ models.CharField.register_lookup(Length)
 
 User = get_user_model()
 
+# Теги с id до 63 хранятся битами в Recipe.tags_mask (знаковый bigint).
+TAGS_MASK_BITS = 63
+
+
+def tag_bit(tag_id: int) -> int:
+    return 1 << (tag_id - 1) if 0 < tag_id <= TAGS_MASK_BITS else 0
+
 
 class Tag(models.Model):
     """Тег для рецепта"""
@@ -40,6 +49,11 @@ class Tag(models.Model):
     def __str__(self):
         return f"{self.name}, цвет — {self.color}"
 
+    @property
+    def bit(self) -> int:
+        """Бит тега в Recipe.tags_mask или 0, если бит не выделен."""
+        return tag_bit(self.pk)
+
     def clean(self) -> None:
         self.name = self.name.strip().lower()
         self.slug = self.slug.strip().lower()
@@ -87,7 +101,7 @@ class Ingredient(models.Model):
         return super().clean()
 
 
-class Recipe(models.Model):
+class Recipe(DenormalizedFieldsMixin, models.Model):
     """Модель рецепта"""
 
     name = models.CharField(
@@ -99,6 +113,7 @@ class Recipe(models.Model):
         related_name="recipes",
         to=User,
         on_delete=models.CASCADE,
+        db_index=False,
     )
     tags = models.ManyToManyField(
         verbose_name="Тег",
@@ -116,6 +131,10 @@ class Recipe(models.Model):
         auto_now_add=True,
         editable=False,
     )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения",
+        auto_now=True,
+    )
     image = models.ImageField(
         verbose_name="Картинка",
         upload_to="recipes_images/",
@@ -139,11 +158,47 @@ class Recipe(models.Model):
             ),
         ),
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="В избранном",
+        default=0,
+        editable=False,
+    )
+    carts_count = models.PositiveIntegerField(
+        verbose_name="В списках покупок",
+        default=0,
+        editable=False,
+    )
+    tags_mask = models.BigIntegerField(
+        verbose_name="Битовая маска тегов",
+        default=0,
+        editable=False,
+    )
+
+    # compute_similar пересчитывает соседей, если рецепт изменился позже
+    # последнего расчета. Рассчитанный рецепт без соседей не пересчитывается.
+    similar_changed_at = models.DateTimeField(
+        verbose_name="Изменение для похожих рецептов",
+        null=True,
+        editable=False,
+    )
+    similar_computed_at = models.DateTimeField(
+        verbose_name="Расчет похожих рецептов",
+        null=True,
+        editable=False,
+    )
+
+    denormalized_fields = (
+        "favorites_count",
+        "carts_count",
+        "tags_mask",
+        "similar_changed_at",
+        "similar_computed_at",
+    )
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
-        ordering = ("-pub_date",)
+        ordering = ("-pub_date", "-id")
         constraints = (
             models.UniqueConstraint(
                 fields=("name", "author"),
@@ -154,6 +209,16 @@ class Recipe(models.Model):
                 name="\n%(app_label)s_%(class)s_name is empty\n",
             ),
         )
+        indexes = (
+            models.Index(
+                fields=("-pub_date", "-id"),
+                name="recipe_pub_date_idx",
+            ),
+            models.Index(
+                fields=("author", "-pub_date", "-id"),
+                name="recipe_author_pub_date_idx",
+            ),
+        )
 
     def __str__(self) -> str:
         return f"{self.name}. Автор: {self.author.username}"
@@ -163,10 +228,14 @@ class Recipe(models.Model):
         return super().clean()
 
     def save(self, *args, **kwargs) -> None:
+        image_changed = bool(self.image) and not self.image._committed
         super().save(*args, **kwargs)
-        image = Image.open(self.image.path)
-        image.thumbnail((500, 500))
-        image.save(self.image.path)
+        if not image_changed:
+            return
+        with metrics.in_progress("image_processing_queue_depth"):
+            image = Image.open(self.image.path)
+            image.thumbnail((500, 500))
+            image.save(self.image.path)
 
 
 class AmountIngredient(models.Model):
@@ -227,6 +296,7 @@ class Favorites(models.Model):
         related_name="user_favorites",
         to=User,
         on_delete=models.CASCADE,
+        db_index=False,
     )
     date_added = models.DateTimeField(
         verbose_name="Дата добавления",
@@ -246,6 +316,12 @@ class Favorites(models.Model):
                 name="\n%(app_label)s_%(class)s recipe is favorite alredy\n",
             ),
         )
+        indexes = (
+            models.Index(
+                fields=("user", "recipe"),
+                name="favorites_user_recipe_idx",
+            ),
+        )
 
     def __str__(self):
         return f"{self.user}: {self.recipe}"
@@ -265,6 +341,7 @@ class Carts(models.Model):
         related_name="user_carts",
         to=User,
         on_delete=models.CASCADE,
+        db_index=False,
     )
     date_added = models.DateTimeField(
         verbose_name="Дата добавления",
@@ -284,6 +361,119 @@ class Carts(models.Model):
                 name="\n%(app_label)s_%(class)s recipe is cart alredy\n",
             ),
         )
+        indexes = (
+            models.Index(
+                fields=("user", "recipe"),
+                name="carts_user_recipe_idx",
+            ),
+        )
 
     def __str__(self):
         return f"{self.user}: {self.recipe}"
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписчика"""
+
+    user = models.ForeignKey(
+        verbose_name="Подписчик",
+        related_name="feed",
+        to=User,
+        on_delete=models.CASCADE,
+    )
+    recipe = models.ForeignKey(
+        verbose_name="Рецепт",
+        related_name="feed_entries",
+        to=Recipe,
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        verbose_name="Автор рецепта",
+        related_name="+",
+        to=User,
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField(
+        verbose_name="Дата публикации рецепта",
+    )
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "recipe"),
+                name="\n%(app_label)s_%(class)s recipe in feed alredy\n",
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=("user", "-pub_date", "-recipe"),
+                name="feed_user_pub_date_idx",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.user}: {self.recipe_id}"
+
+
+class FanOutJob(models.Model):
+    """Рецепт, который еще не разложен по лентам подписчиков"""
+
+    recipe = models.OneToOneField(
+        verbose_name="Рецепт",
+        related_name="+",
+        to=Recipe,
+        on_delete=models.CASCADE,
+    )
+    created_at = models.DateTimeField(
+        verbose_name="Дата постановки",
+        auto_now_add=True,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = "Раскладка по лентам"
+        verbose_name_plural = "Раскладки по лентам"
+
+    def __str__(self):
+        return str(self.recipe_id)
+
+
+class SimilarRecipe(models.Model):
+    """Похожий рецепт, рассчитанный командой compute_similar"""
+
+    recipe = models.ForeignKey(
+        verbose_name="Рецепт",
+        related_name="similar",
+        to=Recipe,
+        on_delete=models.CASCADE,
+    )
+    similar = models.ForeignKey(
+        verbose_name="Похожий рецепт",
+        related_name="+",
+        to=Recipe,
+        on_delete=models.CASCADE,
+    )
+    score = models.FloatField(
+        verbose_name="Сходство",
+    )
+
+    class Meta:
+        verbose_name = "Похожий рецепт"
+        verbose_name_plural = "Похожие рецепты"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("recipe", "similar"),
+                name="\n%(app_label)s_%(class)s similar recipe alredy\n",
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=("recipe", "-score"),
+                name="similar_recipe_score_idx",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.recipe_id} ~ {self.similar_id}: {self.score:.2f}"
@@ -0,0 +1,146 @@
+from core.cache import bump_recipes_version, forget_user_flags
+from core.features import (
+    change_counter,
+    in_bulk_update,
+    mark_similar_stale,
+    refresh_tags_mask,
+    touch_recipes,
+    will_save,
+)
+from core.feed import schedule_fan_out
+from core.pantry import schedule_change
+from core.search import index_recipe, unindex_recipe
+from core.trigrams import invalidate
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from recipes.models import (
+    AmountIngredient,
+    Carts,
+    Favorites,
+    Ingredient,
+    Recipe,
+    SimilarRecipe,
+    Tag,
+)
+from users.models import User
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance: Recipe, created: bool, **kwargs) -> None:
+    if created:
+        change_counter(User, instance.author_id, "recipes_count", 1)
+        schedule_fan_out(instance)
+    bump_recipes_version()
+    update_fields = kwargs["update_fields"]
+    if update_fields is None or {"name", "text"} & update_fields:
+        index_recipe(instance, kwargs["using"])
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance: Recipe, **kwargs) -> None:
+    # Строки с рецептом удалятся каскадом: списки, где он был, устаревают.
+    mark_similar_stale(
+        *SimilarRecipe.objects.filter(similar=instance).values_list(
+            "recipe_id", flat=True
+        )
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance: Recipe, **kwargs) -> None:
+    change_counter(User, instance.author_id, "recipes_count", -1)
+    bump_recipes_version()
+    unindex_recipe(instance.pk, kwargs["using"])
+
+
+@receiver(post_save, sender=Favorites)
+def favorite_added(sender, instance: Favorites, created: bool, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, "favorites_count", 1)
+        forget_user_flags(instance.user_id, "favorites")
+
+
+@receiver(post_delete, sender=Favorites)
+def favorite_removed(sender, instance: Favorites, **kwargs) -> None:
+    change_counter(Recipe, instance.recipe_id, "favorites_count", -1)
+    forget_user_flags(instance.user_id, "favorites")
+
+
+@receiver(post_save, sender=Carts)
+def cart_added(sender, instance: Carts, created: bool, **kwargs) -> None:
+    if created:
+        change_counter(Recipe, instance.recipe_id, "carts_count", 1)
+        forget_user_flags(instance.user_id, "carts")
+
+
+@receiver(post_delete, sender=Carts)
+def cart_removed(sender, instance: Carts, **kwargs) -> None:
+    change_counter(Recipe, instance.recipe_id, "carts_count", -1)
+    forget_user_flags(instance.user_id, "carts")
+
+
+@receiver(post_save, sender=AmountIngredient)
+@receiver(post_delete, sender=AmountIngredient)
+def recipe_ingredients_changed(
+    sender, instance: AmountIngredient, **kwargs
+) -> None:
+    # Админка и каскадное удаление рецепта меняют строки по одной, а
+    # update_recipe_ingredients обновляет рецепт сам один раз в конце.
+    if in_bulk_update():
+        return
+    schedule_change(instance.recipe_id)
+    mark_similar_stale(instance.recipe_id)
+    touch_recipes(pk=instance.recipe_id)
+    bump_recipes_version()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(
+    sender, instance, action: str, reverse: bool, pk_set, **kwargs
+) -> None:
+    if reverse and action == "pre_clear":
+        tag_removed(Tag, instance)
+        return
+    if not action.startswith("post_") or (reverse and action == "post_clear"):
+        return
+    recipe_ids = pk_set if reverse else {instance.pk}
+    refresh_tags_mask(recipe_ids)
+    mark_similar_stale(*recipe_ids)
+    touched = {pk for pk in recipe_ids if not will_save(pk)}
+    if touched:
+        touch_recipes(pk__in=touched)
+    bump_recipes_version()
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_removed(sender, instance: Tag, **kwargs) -> None:
+    touch_recipes(tags=instance)
+    if instance.bit:
+        Recipe.objects.filter(tags=instance).update(
+            tags_mask=F("tags_mask").bitand(~instance.bit)
+        )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tags_changed(sender, instance: Tag, **kwargs) -> None:
+    # created есть только у post_save; при удалении рецепты уже обновлены.
+    if not kwargs.get("created", True):
+        touch_recipes(tags=instance)
+    bump_recipes_version()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredients_changed(sender, instance: Ingredient, **kwargs) -> None:
+    invalidate()
+    if not kwargs.get("created", True):
+        touch_recipes(ingredients=instance)
+    bump_recipes_version()
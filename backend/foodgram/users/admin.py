@@ -1,10 +1,11 @@
-from django.contrib.admin import ModelAdmin, register
+from core.admin import LargeTableAdmin
+from django.contrib.admin import register
 
 from .models import User
 
 
 @register(User)
-class UserAdmin(ModelAdmin):
+class UserAdmin(LargeTableAdmin):
     """Класс настройки раздела пользователей."""
 
     list_display = (
@@ -13,6 +14,8 @@ class UserAdmin(ModelAdmin):
         "first_name",
         "last_name",
         "email",
+        "recipes_count",
+        "followers_count",
     )
     fields = (
         ("is_active",),
@@ -21,6 +24,6 @@ class UserAdmin(ModelAdmin):
     )
     search_fields = ("email", "username")
     empty_value_display = "Значение отсутствует"
-    list_filter = ("is_active", "first_name", "email")
+    list_filter = ("is_active", "is_staff")
     save_on_top = True
     list_per_page = 10
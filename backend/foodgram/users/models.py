@@ -1,3 +1,4 @@
+from core.models import DenormalizedFieldsMixin
 from core.validators import MinLenValidator, StrValidator
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
@@ -8,7 +9,7 @@ from django.db.models.functions import Length
 models.CharField.register_lookup(Length)
 
 
-class User(AbstractUser):
+class User(DenormalizedFieldsMixin, AbstractUser):
     """Модель пользователя."""
 
     email = models.EmailField(
@@ -62,6 +63,20 @@ class User(AbstractUser):
         verbose_name="Активирован",
         default=True,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name="Количество рецептов",
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name="Количество подписчиков",
+        default=0,
+        editable=False,
+    )
+
+    denormalized_fields = ("recipes_count", "followers_count")
+    # Поля автора, которые попадают в ответы с рецептами.
+    author_fields = ("email", "username", "first_name", "last_name")
 
     class Meta:
         verbose_name = "Пользователь"
@@ -77,6 +92,40 @@ class User(AbstractUser):
     def __str__(self) -> str:
         return f"{self.username}: {self.email}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_author = instance._author_values()
+        return instance
+
+    def save(self, *args, **kwargs) -> None:
+        super().save(*args, **kwargs)
+        values = self._author_values()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            values = {
+                **getattr(self, "_saved_author", {}),
+                **{
+                    name: value
+                    for name, value in values.items()
+                    if name in update_fields
+                },
+            }
+        self._saved_author = values
+
+    def _author_values(self) -> dict:
+        # Отложенные поля не загружаются ради сравнения.
+        return {
+            name: self.__dict__[name]
+            for name in self.author_fields
+            if name in self.__dict__
+        }
+
+    def author_changed(self) -> bool:
+        """Отличаются ли поля автора от прочитанных из базы."""
+        saved = getattr(self, "_saved_author", None)
+        return saved is None or self._author_values() != saved
+
     @classmethod
     def normalize_email(cls, email: str) -> str:
         """Normalize the email address by lowercasing the domain part of it"""
@@ -128,6 +177,7 @@ class Subscriptions(models.Model):
         related_name="subscribers",
         to=User,
         on_delete=models.CASCADE,
+        db_index=False,
     )
     date_added = models.DateTimeField(
         verbose_name="Дата подписки",
@@ -148,6 +198,12 @@ class Subscriptions(models.Model):
                 name="\nНельзя подписаться на себя\n",
             ),
         )
+        indexes = (
+            models.Index(
+                fields=("user", "author"),
+                name="subscriptions_user_author_idx",
+            ),
+        )
 
     def __str__(self):
         return f"{self.user.username} подписка на {self.author.username}"
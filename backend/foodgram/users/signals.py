@@ -0,0 +1,32 @@
+from core.cache import bump_recipes_version, forget_user_flags
+from core.features import change_counter, touch_recipes
+from core.feed import backfill, forget_author
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import Subscriptions, User
+
+
+@receiver(post_save, sender=Subscriptions)
+def subscribed(sender, instance: Subscriptions, created: bool, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, "followers_count", 1)
+        backfill(instance.user_id, instance.author_id)
+        forget_user_flags(instance.user_id, "subscriptions")
+
+
+@receiver(post_delete, sender=Subscriptions)
+def unsubscribed(sender, instance: Subscriptions, **kwargs) -> None:
+    change_counter(User, instance.author_id, "followers_count", -1)
+    forget_author(instance.user_id, instance.author_id)
+    forget_user_flags(instance.user_id, "subscriptions")
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance: User, created: bool, **kwargs) -> None:
+    update_fields = kwargs["update_fields"]
+    if created or not instance.author_changed():
+        return
+    if update_fields is None or update_fields & set(User.author_fields):
+        touch_recipes(author=instance)
+        bump_recipes_version()